@@ -11,6 +11,7 @@ import psutil
 import logging
 import traceback
 from custom_logger import StructuredLogger
+import instance_pool
 import signal
 import resource
 
@@ -86,7 +87,12 @@ def is_memory_related_error(error, stderr=None):
     return check_string_for_memory_error(str(error))
 
 def worker(config_file, worker_id, task_queue, result_queue, params):
-    """Worker process function that processes instances from the queue"""
+    """
+    Worker process function that processes instances from the queue.
+    Every instance runs in its own child of the worker's fork server, which has instance_solver already imported.
+    """
+    config = instance_pool.load_config(config_file)
+    instance_pool.warm_up()
     while True:
         try:
             instance = task_queue.get()
@@ -99,25 +105,21 @@ def worker(config_file, worker_id, task_queue, result_queue, params):
 
             log_file = os.path.join(params['log_folder'], f"{instance.identifier}.yaml")
 
-            if os.path.isfile(log_file):
+            if os.path.isfile(log_file) and not config.get('resume', False):
                 os.remove(log_file)
             
             logger = StructuredLogger(log_file)
             
             cmd = [
-                sys.executable,
-                "instance_solver.py",
+                "instance_solver.solve_instance",
                 str(config_file),
                 instance.identifier,
             ]
             
             try:
                 print(f"[{datetime.datetime.now()}] Worker {worker_id} executing subprocess for {instance.identifier}", flush=True)
-                if DEBUG:
-                    result = subprocess.run(cmd, check=True, timeout=params['timeout_seconds'])
-                else:
-                    result = subprocess.run(cmd, check=True, timeout=params['timeout_seconds'],
-                                        capture_output=True, text=True)
+                result = instance_pool.solve(config_file, instance.identifier, params['timeout_seconds'],
+                                             config=config, capture_output=not DEBUG)
                 
                 end_time = datetime.datetime.now()
                 duration = (end_time - start_time).total_seconds()
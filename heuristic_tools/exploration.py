@@ -0,0 +1,242 @@
+"""
+Indexed exploration of binarized datalog programs, the core of the lifted h_add, h_max and h_FF heuristics.
+
+Facts are (predicate, args) tuples of the compressed (integer) symbols of a DatalogProgram. Every body atom of
+every rule has a hash index from the values of the variables it shares with the other body atom to the facts
+matching it, so that a new fact is joined only with the facts it agrees with. The rules are turned into
+triggers per predicate once, with their constant and repeated-variable checks, join projections and head
+constructors precomputed; the common cases of the unary relaxation (a single constant to check, a single join
+variable, a head with at most one argument) are handled without function calls. Since the rule costs are small
+non-negative integers, the queue is a bucket per cost, each a heap ordered like the heap of the previous
+implementation, so that facts are popped in the same order and h_FF picks the same achievers.
+"""
+import heapq
+from operator import add, itemgetter
+
+# how the join key of a fact is computed: the empty key, the value at one position, or a getter of several
+_KEY_EMPTY, _KEY_SINGLE, _KEY_GETTER = 0, 1, 2
+# how the args of a derived fact are built: constants only, one value of the fact or of its partner, or a getter
+# of (fact args + partner args + head constants) ordered by body position
+_HEAD_CONST, _HEAD_FACT, _HEAD_PARTNER, _HEAD_GETTER = 0, 1, 2, 3
+
+# the partners of a fact in a rule with one body atom
+_NO_PARTNER = ((None, (), 0),)
+
+
+def _matcher(args, is_var):
+    """Checks of the constants and repeated variables of a body atom, None if every fact of its predicate matches."""
+    checks = []
+    first = {}
+    for i, arg in enumerate(args):
+        if not is_var(arg):
+            checks.append((i, None, arg))
+        elif arg in first:
+            checks.append((i, first[arg], None))
+        else:
+            first[arg] = i
+    return tuple(checks) or None
+
+
+def _matches(args, checks):
+    for i, j, const in checks:
+        if args[i] != (const if j is None else args[j]):
+            return False
+    return True
+
+
+def _key(positions):
+    if not positions:
+        return _KEY_EMPTY, None
+    if len(positions) == 1:
+        return _KEY_SINGLE, positions[0]
+    return _KEY_GETTER, itemgetter(*positions)
+
+
+def _head(rule, body_pos, creator, pos_to_const):
+    """The head mode of rule for a fact at body_pos, its data and the head constants."""
+    arity = len(creator) + len(pos_to_const)
+    if not creator:
+        return _HEAD_CONST, tuple(pos_to_const[i] for i in range(arity)), ()
+    if arity == 1:
+        atom_pos, arg_pos, _ = creator[0]
+        return (_HEAD_FACT if atom_pos == body_pos else _HEAD_PARTNER), arg_pos, ()
+    offsets = [0, len(rule.body[0].args)]
+    width = sum(len(atom.args) for atom in rule.body)
+    positions = [None] * arity
+    for atom_pos, arg_pos, end_pos in creator:
+        positions[end_pos] = offsets[atom_pos] + arg_pos
+    consts = []
+    for end_pos, const in sorted(pos_to_const.items()):
+        positions[end_pos] = width + len(consts)
+        consts.append(const)
+    return _HEAD_GETTER, itemgetter(*positions), tuple(consts)
+
+
+class ExplorationEngine:
+    """
+    Relaxed exploration of binarized rules. The arguments are the parts of a DatalogProgram: its rules, the
+    (rule, body position) pairs per predicate, the join projections and head combinations created by
+    create_creator, the tie breaker of every predicate and the predicate of the goal fact.
+    """
+    def __init__(self, rules, matching_rules, projections, combinations, pq_tie_breaker, goal_pred, is_var):
+        self.rules = rules
+        self.goal = (goal_pred, ())
+        # heap order of the facts of a cost, as (cost, tie breaker, Atom.key) ordered the atoms
+        self.prefix = {pred: (tie_breaker[0], tie_breaker[1], str(pred)) for pred, tie_breaker in pq_tie_breaker.items()}
+
+        triggers = {}
+        for pred, matches in matching_rules.items():
+            for rule_id, body_pos in matches:
+                rule = rules[rule_id]
+                checks = _matcher(rule.body[body_pos].args, is_var)
+                # a single constant is checked inline
+                check_pos, check_const = None, None
+                if checks is not None and len(checks) == 1 and checks[0][1] is None:
+                    (check_pos, _, check_const), checks = checks[0], None
+                if len(rule.body) == 2:
+                    slot, other_slot = 2 * rule_id + body_pos, 2 * rule_id + 1 - body_pos
+                    key_mode, key = _key([arg_pos for _, arg_pos, _ in sorted(projections[(rule_id, body_pos)],
+                                                                            key=lambda entry: entry[2])])
+                else:
+                    slot, other_slot, key_mode, key = None, None, None, None
+                head_mode, head, consts = _head(rule, body_pos, *combinations[rule_id])
+                triggers.setdefault(pred, []).append((
+                    rule_id, rule.step, check_pos, check_const, checks, slot, other_slot, key_mode, key, body_pos,
+                    head_mode, head, consts, rule.head.predicate, self.prefix[rule.head.predicate], rule.cost))
+        self.triggers = triggers
+        self.num_slots = 2 * len(rules)
+
+    def explore(self, init, comb_f=max, FF=False, unary_dict=dict(), first_step=0, unary_relaxed=False,
+                ground_rules=None):
+        """
+        Explores the program from the compressed facts init and returns the cost of the goal fact, or None if it
+        is not reached. The rules of plan steps before first_step are ignored. As before, the exploration stops as
+        soon as the goal fact is derived, after the fact being processed is joined with all of its partners.
+        With a list ground_rules, the exploration goes on until no new fact is derived and appends every ground
+        rule it finds to the list, as (rule id, head fact, body fact, other body fact or None).
+        """
+        triggers = self.triggers
+        prefix = self.prefix
+        goal = self.goal
+        is_max = comb_f is max
+        is_add = comb_f is add
+
+        fact_cost = {}
+        achiever = {}
+        index = [None] * self.num_slots
+        initial = []
+        for fact in init:
+            if fact not in fact_cost:
+                fact_cost[fact] = 0
+                initial.append((prefix[fact[0]], fact[1], fact[0]))
+                if FF:
+                    achiever[fact] = None
+        heapq.heapify(initial)
+        buckets = {0: initial}
+        costs = [0]
+
+        heappush, heappop = heapq.heappush, heapq.heappop
+        while (ground_rules is not None or goal not in fact_cost) and costs:
+            cost = costs[0]
+            bucket = buckets[cost]
+            if not bucket:
+                heappop(costs)
+                del buckets[cost]
+                continue
+            _, args, pred = heappop(bucket)
+            fact = (pred, args)
+            if fact_cost[fact] < cost:
+                continue
+
+            for (rule_id, step, check_pos, check_const, checks, slot, other_slot, key_mode, key, body_pos,
+                 head_mode, head, consts, head_pred, head_prefix, rule_cost) in triggers.get(pred, ()):
+                if step is not None and step < first_step:
+                    continue
+                if check_pos is not None:
+                    if args[check_pos] != check_const:
+                        continue
+                elif checks is not None and not _matches(args, checks):
+                    continue
+
+                if slot is None:
+                    partners = _NO_PARTNER
+                else:
+                    if key_mode == _KEY_SINGLE:
+                        join_key = args[key]
+                    elif key_mode == _KEY_EMPTY:
+                        join_key = ()
+                    else:
+                        join_key = key(args)
+                    facts = index[slot]
+                    if facts is None:
+                        facts = index[slot] = {}
+                    entries = facts.get(join_key)
+                    if entries is None:
+                        facts[join_key] = [(fact, args, cost)]
+                    else:
+                        entries.append((fact, args, cost))
+                    others = index[other_slot]
+                    if others is None:
+                        continue
+                    partners = others.get(join_key)
+                    if partners is None:
+                        continue
+
+                for other_fact, other_args, other_cost in partners:
+                    if other_fact is None:
+                        new_cost = rule_cost + cost
+                    elif is_add:
+                        new_cost = rule_cost + cost + other_cost
+                    elif is_max:
+                        new_cost = rule_cost + (cost if cost >= other_cost else other_cost)
+                    else:
+                        new_cost = rule_cost + comb_f(cost, other_cost)
+                    if head_mode == _HEAD_FACT:
+                        head_args = (args[head],)
+                    elif head_mode == _HEAD_CONST:
+                        head_args = head
+                    elif head_mode == _HEAD_PARTNER:
+                        head_args = (other_args[head],)
+                    else:
+                        head_args = head((args + other_args if body_pos == 0 else other_args + args) + consts)
+                    new_fact = (head_pred, head_args)
+                    if ground_rules is not None:
+                        ground_rules.append((rule_id, new_fact, fact, other_fact))
+                    old_cost = fact_cost.get(new_fact)
+                    if old_cost is not None and old_cost <= new_cost:
+                        continue
+                    fact_cost[new_fact] = new_cost
+                    new_bucket = buckets.get(new_cost)
+                    if new_bucket is None:
+                        new_bucket = buckets[new_cost] = []
+                        heappush(costs, new_cost)
+                    heappush(new_bucket, (head_prefix, head_args, head_pred))
+                    if FF:
+                        achiever[new_fact] = (rule_id, fact, other_fact)
+
+        if goal not in fact_cost:
+            return None
+        if not FF:
+            return fact_cost[goal]
+
+        rules = self.rules
+        facts_seen = set()
+        rules_seen = set()
+        stack = [goal]
+        while stack:
+            fact = stack.pop()
+            if fact in facts_seen:
+                continue
+            facts_seen.add(fact)
+            reason = achiever[fact]
+            if reason is None:
+                continue
+            rule_id, first, second = reason
+            rules_seen.add(rules[rule_id])
+            stack.append(first)
+            if second is not None:
+                stack.append(second)
+
+        if unary_relaxed:
+            rules_seen = set(unary_dict[rule] for rule in rules_seen)
+        return sum(rule.cost for rule in rules_seen)
@@ -1,12 +1,8 @@
 import collections
 import itertools
-import shutil
-import subprocess
-from pathlib import Path
 from io import UnsupportedOperation
 from fd.pddl.effects import add_effect
 import fd.pddl.conditions
-from relaxation_generator.shortcuts import ground
 from fd.pddl.tasks import Task
 import copy
 import pickle
@@ -14,7 +10,9 @@ import contextlib
 import os
 import sys
 import time
-import heapq
+import operator
+from heuristic_tools.exploration import ExplorationEngine
+from heuristic_tools import lmcut, vectorized
 
 # next two definitions copied from Fast Downward
 
@@ -71,89 +69,8 @@ dprint = lambda *args, **kwargs: None
 if not DEBUG:
     dprint = print
 
-BASE_FOLDER = r''
-INPUT_MODEL_DOMAIN = BASE_FOLDER + "domain-in.pddl"
-INPUT_MODEL_PROBLEM = BASE_FOLDER + "problem-in.pddl"
-OUTPUT_MODEL_DOMAIN = BASE_FOLDER + "domain-out.pddl"
-OUTPUT_MODEL_PROBLEM = BASE_FOLDER + "problem-out.pddl"
-OLD_OUTPUT_MODEL_DOMAIN = BASE_FOLDER + "old-domain-out.pddl"
-OLD_OUTPUT_MODEL_PROBLEM = BASE_FOLDER + "old-problem-out.pddl"
-DATALOG_THEORY = BASE_FOLDER + "datalog.theory"
-DATALOG_MODEL = BASE_FOLDER + "datalog.model"
-GROUNDED_OUTPUT_SAS = BASE_FOLDER + "out.sas"
-
 INFTY = 10**42
 
-transform_to_fd = {
-    "G_HMAX": "hmax",
-    "G_HADD": "add",
-    "G_HFF": "ff",
-    "G_LM_CUT": "lmcut"
-}
-
-transform_to_pwl = {
-    "L_HMAX": "hmax",
-    "L_HADD": "add",
-    "L_HFF": "ff"
-}
-
-current_dir = Path(__file__).resolve().parent
-parent_dir = current_dir.parent
-POWERLIFTED_PY = parent_dir / 'pwl' / 'powerlifted.py'
-FAST_DOWNWARD_PY = parent_dir / 'fd2' / 'fast-downward.py'
-
-def _get_heuristic(command, look_for):
-    output_file = BASE_FOLDER + "heuristic_value.tmp"
-
-    with timing("Calling Heuristic", block=True):
-        with open(output_file, "w") as f:
-            dprint("Running", *command)
-            subprocess.run(command, stdout=f)
-
-    with timing("Parsing Heuristic Value", block=True):
-        with open(output_file, "r") as file:
-            for line in file:
-                if look_for in line:
-                    return line.split(":")[1].strip()
-
-    assert False, "shouldn't reach this"
-    return None
-
-def get_heuristic(command, look_for):
-    val = _get_heuristic(command, look_for)
-    if val == 'infinity':
-        return -1
-    return int(val)
-
-def get_fd_value(heuristic, domain_file, instance_file):
-    heuristic = transform_to_fd[heuristic]
-
-    command = [
-        "python3", FAST_DOWNWARD_PY,
-        domain_file, instance_file,
-        "--search", f"astar({heuristic}())"
-    ]
-
-    # print("Calling", *command)
-    return get_heuristic(command, "Initial heuristic value for")
-
-def get_pwl_value(heuristic, domain_file, instance_file):
-    search_algorithm = "print-initial-h"
-    heuristic = transform_to_pwl[heuristic]
-    generator = "yannakakis"
-
-    command = [
-        "python3", POWERLIFTED_PY,
-        "-d", domain_file,
-        "-i", instance_file,
-        "-s", search_algorithm,
-        "-e", heuristic,
-        "-g", generator
-    ]
-
-    # print("Calling", *command)
-    return get_heuristic(command, "Initial heuristic value is:")
-
 def unprotect(s):
     """
     Creates an attribute name for all attributes _name in s.
@@ -166,6 +83,19 @@ def unprotect(s):
             if new_attr not in d:
                 setattr(s, new_attr, value)
 
+def copy_for_integration(domain, task):
+    """
+    Return copies of domain, task whose lists can be extended by the integrate functions.
+    The actions, predicates and atoms themselves are shared, actions are copied before they are modified.
+    """
+    domain = domain.copy()
+    domain._constants = list(domain._constants)
+    domain._predicates = list(domain._predicates)
+    domain._actions = list(domain._actions)
+    task = task.copy()
+    task.set_init_state(list(task.init))
+    return domain, task
+
 def revert_to_fd_structure(domain, task):
     """
     Return domain, task in fd.pddl format for given _domain, _task in model.domain format
@@ -292,6 +222,7 @@ def integrate_action_sequence(domain, task, action_sequence):
         var_remap = dict((new_action.parameters[j].name, obj) for obj, j in action_constants)
         remap_vars(new_action, var_remap)
         new_action.name += f"-step-{i}"
+        new_action.plan_step = i
 
         # conditions to increase counter
         add_to_pre(fd.pddl.conditions.Atom(COUNTER_PRED, [make_num(i)]), new_action)
@@ -364,18 +295,30 @@ def integrate_pre_repair(domain, task, ref_action):
     ])
 
 class DatalogRule:
-    def __init__(self, head, body, cost):
+    def __init__(self, head, body, cost, step=None, action=None):
         assert type(cost) is int or type(cost) is float
         self.head = head
         self.body = body
         self.cost = cost
+        # plan step of the action the rule stems from, None if it belongs to every suffix of the plan
+        self.step = step
+        # (action id, parameters of its add effects) of the action whose cost the rule carries, see lmcut
+        self.action = action
 
 DL_GOAL = "pred_dl_goal"
-def pddl_to_datalog_rules(domain):
+def pddl_to_datalog_rules(domain, ground_actions=False):
+    """
+    One rule per add effect of every action. With ground_actions, the rules are tagged with their action, so
+    that the rules of the add effects of a ground action can be told apart after binarization.
+    """
     rules = []
 
-    for action in domain.actions:
+    for action_id, action in enumerate(domain.actions):
         rule_body = datalog_pre(action)
+        action_tag = None
+        if ground_actions:
+            action_pars = set().union(*(get_pars(eff.literal) for eff in action.effects if not eff.literal.negated))
+            action_tag = (action_id, tuple(sorted(action_pars)))
 
         for par in action.parameters:
             if par.type != 'object':
@@ -386,7 +329,7 @@ def pddl_to_datalog_rules(domain):
 
             lit = eff.literal
             if not lit.negated:
-                rules.append(DatalogRule(lit, rule_body, action.cost))
+                rules.append(DatalogRule(lit, rule_body, action.cost, getattr(action, "plan_step", None), action_tag))
 
     return rules
 
@@ -449,6 +392,9 @@ def binarize_datalog(dl_rules, init, unary_dict):
             new_rules.append(rule)
         else:
             head_pars = get_pars(rule.head)
+            if rule.action is not None:
+                # the body of the last rule keeps all parameters of the add effects, which bind the ground action
+                head_pars |= set(rule.action[1])
             rule.body.sort(key=atom_sorter(head_pars, pred_sizes))
 
             par_count = collections.defaultdict(lambda: 0)
@@ -479,7 +425,7 @@ def binarize_datalog(dl_rules, init, unary_dict):
                 tmp_pars = list(sorted(set(par for par in itertools.chain(get_pars(temporaries[i]),get_pars(temporaries[j])) if (par in head_pars or par_count[par] > local_par_count[par]))))
                 tmp_atom = fd.pddl.Atom(tmp_pred(len(new_rules)), tmp_pars)
 
-                new_r = DatalogRule(tmp_atom, [temporaries[i], temporaries[j]], 0)
+                new_r = DatalogRule(tmp_atom, [temporaries[i], temporaries[j]], 0, rule.step)
                 new_rules.append(new_r)
                 if unary_dict:
                     unary_dict[new_r] = unary_dict[rule]
@@ -533,7 +479,7 @@ def binarize_datalog(dl_rules, init, unary_dict):
                     j = get_unremoved(i+1)
                     add_rule(i, j)
 
-            new_r = DatalogRule(rule.head, [temporaries[get_unremoved()]], rule.cost)
+            new_r = DatalogRule(rule.head, [temporaries[get_unremoved()]], rule.cost, rule.step, rule.action)
             new_rules.append(new_r)
             if unary_dict:
                 unary_dict[new_r] = unary_dict[rule]
@@ -554,14 +500,14 @@ def intersection(li):
 
     return result
 
-def __is_var(arg):
+def _is_var(arg):
     if not COMPRESS:
         return arg[0] == "?"
     else:
         return arg >= 0
 
-def __vars_of(atom):
-    return set(arg for arg in atom.args if __is_var(arg))
+def _vars_of(atom):
+    return set(arg for arg in atom.args if _is_var(arg))
 
 def create_creator(atoms, proj_vars):
     seen = set()
@@ -591,7 +537,7 @@ def can_match(gr_atom, l_atom):
     assert gr_atom.predicate == l_atom.predicate
     assigned = dict()
     for g_arg, l_arg in zip(gr_atom.args, l_atom.args):
-        if not __is_var(l_arg):
+        if not _is_var(l_arg):
             if g_arg != l_arg:
                 return False
         else:
@@ -601,8 +547,8 @@ def can_match(gr_atom, l_atom):
 
     return True
 
-def __pos_to_const(atom):
-    return dict((i, arg) for i, arg in enumerate(atom.args) if not __is_var(arg))
+def _pos_to_const(atom):
+    return dict((i, arg) for i, arg in enumerate(atom.args) if not _is_var(arg))
 
 
 def _pq_tie_breaker(pred, arities, unary_relaxed):
@@ -623,189 +569,165 @@ def _pq_tie_breaker(pred, arities, unary_relaxed):
 
     return [repair_level, arity]
 
-def dl_exploration(init, rules, comb_f=max, unary_relaxed=False, FF=False, unary_dict=dict()):
-    fact_cost = dict()
-    priority_queue = []
-    pq_tie_breaker = dict()
-    arities = dict()
-
-    for rule in rules:
-        for atom in itertools.chain([rule.head], rule.body):
-            if atom.predicate not in arities:
-                arities[atom.predicate] = len(atom.args)
-
-    for atom in init:
-        if type(atom) != fd.pddl.f_expression.Assign:
-            if atom.predicate not in arities:
-                arities[atom.predicate] = len(atom.args)
-
-    for pred in arities.keys():
-        pq_tie_breaker[pred] = _pq_tie_breaker(pred, arities, unary_relaxed)
-
-    goal_pred_symbol = None
-    if COMPRESS:
-        pred_compression = dict()
-        obj_compression = dict()
-
-        def compress_atom(atom):
-            if type(atom.predicate) == str:
-                if atom.predicate not in pred_compression:
-                    pred_compression[atom.predicate] = len(pred_compression)
-                atom.predicate = pred_compression[atom.predicate]
-
-                atom.args = list(atom.args)
-                for i in range(len(atom.args)):
-                    assert type(atom.args[i]) == str
-                    if atom.args[i] not in obj_compression:
-                        # hack to use ints > 0 as vars, < 0 as objects
-                        obj_compression[atom.args[i]] = (1+len(obj_compression)) * (1 if atom.args[i][0] == "?" else -1)
-                    atom.args[i] = obj_compression[atom.args[i]]
-                atom.args = tuple(atom.args)
-            else:
-                assert all(type(arg) == int for arg in atom.args)
+class DatalogProgram:
+    """
+    Binarized datalog rules prepared for the exploration: predicates and objects are compressed and the
+    join indices of the rules are built once, so that the program can be explored from several initial states.
+    With vectorize, the h_add and h_max values of zeroary and unary programs are computed with array operations,
+    which pays off when the program is explored many times, and with incremental also from the previous
+    exploration, see VectorizedEvaluator.
+    """
+    def __init__(self, rules, unary_relaxed=False, vectorize=False, incremental=False):
+        self.rules = rules
+        self.unary_relaxed = unary_relaxed
+        self.incremental = incremental
 
+        arities = dict()
         for rule in rules:
-            compress_atom(rule.head)
-            for b in rule.body:
-                compress_atom(b)
-
-        for atom in init:
-            if type(atom) != fd.pddl.f_expression.Assign:
-                compress_atom(atom)
-
-        goal_pred_symbol = pred_compression[GOAL_PRED]
-        pq_tie_breaker = dict((pred_compression[p], v) for p, v in pq_tie_breaker.items())
-    else:
-        goal_pred_symbol = GOAL_PRED
-
-    assert goal_pred_symbol is not None
+            for atom in itertools.chain([rule.head], rule.body):
+                if atom.predicate not in arities:
+                    arities[atom.predicate] = len(atom.args)
 
-    achiever = dict()
+        pq_tie_breaker = dict()
+        for pred in arities.keys():
+            pq_tie_breaker[pred] = _pq_tie_breaker(pred, arities, unary_relaxed)
 
-    for el in init:
-        if type(el) is fd.pddl.Atom:
-            priority_queue.append((0, pq_tie_breaker[el.predicate], el))
-            fact_cost[el] = 0
-            if FF:
-                achiever[el] = ([], None)
+        # the action id and the positions of its parameters in the body atom of the rules tagged with an action
+        self.actions = []
+        for rule in rules:
+            if rule.action is None:
+                self.actions.append(None)
+            else:
+                assert len(rule.body) == 1
+                args = list(rule.body[0].args)
+                self.actions.append((rule.action[0], tuple(args.index(par) for par in rule.action[1] if par in args)))
+
+        self.pred_compression = dict()
+        self.obj_compression = dict()
+        if COMPRESS:
+            for rule in rules:
+                self._compress_atom(rule.head)
+                for b in rule.body:
+                    self._compress_atom(b)
+
+            self.goal_pred_symbol = self.pred_compression[GOAL_PRED]
+            pq_tie_breaker = dict((self.pred_compression[p], v) for p, v in pq_tie_breaker.items())
         else:
-            assert type(el) is fd.pddl.f_expression.Assign
-
-    heapq.heapify(priority_queue)
-
-    matching_rules = collections.defaultdict(lambda: list())
-    for i, rule in enumerate(rules):
-        for j, atom in enumerate(rule.body):
-            matching_rules[atom.predicate].append((i, j))
-
-    for k, v in matching_rules.items():
-        matching_rules[k] = list(sorted(set(v)))
-
-    projections = dict()
-    combinations = dict()
-    rule_body_pos_container = collections.defaultdict(lambda: collections.defaultdict(lambda: set()))
-    for i, rule in enumerate(rules):
-        assert 1 <= len(rule.body) <= 2, rule.body
-        shared_vars = list(sorted(intersection([__vars_of(atom) for atom in rule.body])))
-        shared_vars = dict((v, [i]) for i, v in enumerate(shared_vars))
-
-        for j, atom in enumerate(rule.body):
-            creator = create_creator([atom], shared_vars)
-            projections[(i, j)] = creator
-            assert len(creator) <= len(atom.args)
-
-            matching_rules[atom.predicate].append((i, j))
-
-        v_to_pos = collections.defaultdict(lambda: [])
-        for z, arg in enumerate(rule.head.args):
-            if __is_var(arg):
-                v_to_pos[arg].append(z)
-        combinations[i] = (create_creator(rule.body, v_to_pos), __pos_to_const(rule.head))
-
-    GOAL_FACT = fd.pddl.conditions.Atom(goal_pred_symbol, [])
-    while GOAL_FACT not in fact_cost:
-        if not priority_queue:
-            break
-
-        current_cost, _, current_fact = heapq.heappop(priority_queue)
-
-        if current_fact in fact_cost and fact_cost[current_fact] < current_cost:
-            continue
-        assert fact_cost[current_fact] == current_cost
-
-        for rule_id, body_pos in matching_rules[current_fact.predicate]:
-            _rule = rules[rule_id]
-            assert current_fact.predicate == _rule.body[body_pos].predicate
-            if not can_match(current_fact, _rule.body[body_pos]):
+            self.goal_pred_symbol = GOAL_PRED
+        self.pq_tie_breaker = pq_tie_breaker
+
+        matching_rules = collections.defaultdict(lambda: list())
+        for i, rule in enumerate(rules):
+            for j, atom in enumerate(rule.body):
+                matching_rules[atom.predicate].append((i, j))
+
+        for k, v in matching_rules.items():
+            matching_rules[k] = list(sorted(set(v)))
+        self.matching_rules = matching_rules
+
+        self.projections = dict()
+        self.combinations = dict()
+        for i, rule in enumerate(rules):
+            assert 1 <= len(rule.body) <= 2, rule.body
+            shared_vars = list(sorted(intersection([_vars_of(atom) for atom in rule.body])))
+            shared_vars = dict((v, [i]) for i, v in enumerate(shared_vars))
+
+            for j, atom in enumerate(rule.body):
+                creator = create_creator([atom], shared_vars)
+                self.projections[(i, j)] = creator
+                assert len(creator) <= len(atom.args)
+
+            v_to_pos = collections.defaultdict(lambda: [])
+            for z, arg in enumerate(rule.head.args):
+                if _is_var(arg):
+                    v_to_pos[arg].append(z)
+            self.combinations[i] = (create_creator(rule.body, v_to_pos), _pos_to_const(rule.head))
+
+        self.engine = ExplorationEngine(rules, matching_rules, self.projections, self.combinations,
+                                        pq_tie_breaker, self.goal_pred_symbol, _is_var)
+        self.vectorizable = vectorize and vectorized.applies(rules)
+        self.vectorized = None
+
+    def _compress_atom(self, atom):
+        if type(atom.predicate) == str:
+            if atom.predicate not in self.pred_compression:
+                self.pred_compression[atom.predicate] = len(self.pred_compression)
+            atom.predicate = self.pred_compression[atom.predicate]
+
+            atom.args = list(atom.args)
+            for i in range(len(atom.args)):
+                assert type(atom.args[i]) == str
+                atom.args[i] = self._compress_obj(atom.args[i])
+            atom.args = tuple(atom.args)
+        else:
+            assert all(type(arg) == int for arg in atom.args)
+
+    def _compress_obj(self, obj):
+        if obj not in self.obj_compression:
+            # hack to use ints > 0 as vars, < 0 as objects
+            self.obj_compression[obj] = (1+len(self.obj_compression)) * (1 if obj[0] == "?" else -1)
+        return self.obj_compression[obj]
+
+    def compress_init(self, init):
+        """
+        Returns the atoms of init as the (predicate, args) facts of the rules. Atoms of predicates that
+        no rule mentions are left out, the atoms of init itself are not modified.
+        """
+        facts = []
+        for atom in init:
+            if type(atom) is fd.pddl.f_expression.Assign:
                 continue
+            assert type(atom) is fd.pddl.Atom
+            if not COMPRESS:
+                if atom.predicate in self.pq_tie_breaker:
+                    facts.append((atom.predicate, tuple(atom.args)))
+            elif atom.predicate in self.pred_compression:
+                facts.append((self.pred_compression[atom.predicate],
+                              tuple(self._compress_obj(arg) for arg in atom.args)))
+        return facts
+
+    def explore(self, init, comb_f=max, FF=False, unary_dict=dict(), first_step=0):
+        """
+        Explores the program from the compressed facts init, see ExplorationEngine. The rules of plan steps before
+        first_step are ignored. Without FF, vectorizable programs are evaluated by a VectorizedEvaluator, built on
+        first use, which returns the same values.
+        """
+        if self.vectorizable and not FF and comb_f in (max, operator.add):
+            if self.vectorized is None:
+                self.vectorized = vectorized.VectorizedEvaluator(self.rules, self.goal_pred_symbol, _is_var,
+                                                                 self.incremental)
+            value = self.vectorized.evaluate(init, comb_f is operator.add, first_step)
+        else:
+            value = self.engine.explore(init, comb_f, FF, unary_dict, first_step, self.unary_relaxed)
+        return INFTY if value is None else value
+
+    def lm_cut(self, init, first_step=0):
+        """The LM-cut value of the goal fact from the compressed facts init, on the ground rules reached from it."""
+        # LM-cut is 0 where h_max is, which the exploration finds without grounding the whole program
+        value = self.engine.explore(init, max, first_step=first_step)
+        if value is None:
+            return INFTY
+        if value == 0:
+            return 0
+        ground_rules = []
+        self.engine.explore(init, max, first_step=first_step, ground_rules=ground_rules)
+        value = lmcut.lm_cut([(head, (fact,) if other_fact is None else (fact, other_fact), self.rules[rule_id].cost,
+                               self._ground_action(rule_id, fact))
+                              for rule_id, head, fact, other_fact in ground_rules],
+                             init, self.engine.goal)
+        return INFTY if value is None else value
+
+    def _ground_action(self, rule_id, fact):
+        """The ground action of a ground rule with the body fact, None for rules not tagged with an action."""
+        action = self.actions[rule_id]
+        if action is None:
+            return None
+        action_id, positions = action
+        return (action_id, tuple(fact[1][i] for i in positions))
 
-            projection = combine_or_project([current_fact], projections[(rule_id, body_pos)], dict())
-            rule_body_pos_container[(rule_id, body_pos)][projection].add(current_fact)
-
-            if len(_rule.body) == 2:
-                contained = rule_body_pos_container[(rule_id, other_pos(body_pos))][projection]
-
-                for other_fact in contained:
-                    other_f_cost = fact_cost[other_fact]
-                    combined_cost = _rule.cost + comb_f(current_cost, other_f_cost)
-
-                    to_combine = [current_fact, other_fact] if body_pos == 0 else [other_fact, current_fact]
-                    combined_args = combine_or_project(to_combine, *combinations[rule_id])
-                    combined_fact = fd.pddl.conditions.Atom(_rule.head.predicate, combined_args)
-
-                    if combined_fact in fact_cost and fact_cost[combined_fact] <= combined_cost:
-                        continue
-
-                    fact_cost[combined_fact] = combined_cost
-                    heapq.heappush(priority_queue, (combined_cost, pq_tie_breaker[combined_fact.predicate], combined_fact))
-                    if FF:
-                        achiever[combined_fact] = ([current_fact, other_fact], _rule)
-            else:
-                assert len(_rule.body) == 1
-                combined_cost = _rule.cost + current_cost
-                combined_args = combine_or_project([current_fact], *combinations[rule_id])
-
-                combined_fact = fd.pddl.conditions.Atom(_rule.head.predicate, combined_args)
-
-                if combined_fact in fact_cost and fact_cost[combined_fact] <= combined_cost:
-                    continue
-
-                fact_cost[combined_fact] = combined_cost
-                heapq.heappush(priority_queue, (combined_cost, pq_tie_breaker[combined_fact.predicate], combined_fact))
-                if FF:
-                    achiever[combined_fact] = ([current_fact], _rule)
-
-    if GOAL_FACT not in fact_cost:
-        return INFTY
-
-    if not FF:
-        return fact_cost[GOAL_FACT]
-
-    assert GOAL_FACT in achiever
-
-    fact_seen = set()
-    rules_seen = set()
-    q = [GOAL_FACT]
-
-    while len(q):
-        f = q.pop()
-        if f in fact_seen:
-            continue
-
-        fact_seen.add(f)
-
-        achievers, rule = achiever[f]
-
-        rules_seen.add(rule)
-        for f in achievers:
-            q.append(f)
-
-    rules_seen.remove(None)
-
-    if unary_relaxed:
-        rules_seen = set(unary_dict[r] for r in rules_seen)
-
-    return sum(rule.cost for rule in rules_seen)
+def dl_exploration(init, rules, comb_f=max, unary_relaxed=False, FF=False, unary_dict=dict()):
+    program = DatalogProgram(rules, unary_relaxed)
+    return program.explore(program.compress_init(init), comb_f, FF, unary_dict)
 
 ACTIVATE_STUB = "activate_"
 USE_STUB = "use_"
@@ -927,7 +849,7 @@ def unary_relax(init, rules):
     for rule in old_rules:
         body = [unary_atom for b in rule.body for unary_atom in unary_split_atom(b)]
         for unary_atom in unary_split_atom(rule.head):
-            new_r = DatalogRule(unary_atom, body, rule.cost)
+            new_r = DatalogRule(unary_atom, body, rule.cost, rule.step, rule.action)
             rules.append(new_r)
             rule_to_original_id[new_r] = rule
 
@@ -946,9 +868,26 @@ def zeroary_relax(init, rules):
         for atom in rule.body:
             atom.args = tuple()
 
-    for atom in init:
-        if type(atom) != fd.pddl.f_expression.Assign:
-            atom.args = tuple()
+    # the atoms of init can be shared with the task, so they are replaced instead of modified
+    init[:] = [atom if type(atom) == fd.pddl.f_expression.Assign else fd.pddl.conditions.Atom(atom.predicate, [])
+               for atom in init]
+
+
+def relax_atoms(atoms, relaxation):
+    """
+    Returns relaxed copies of atoms, relaxed like unary_relax and zeroary_relax relax the initial state.
+    """
+    relaxed = []
+    for atom in atoms:
+        if type(atom) == fd.pddl.f_expression.Assign:
+            continue
+        if relaxation == "unary":
+            relaxed += unary_split_atom(atom)
+        elif relaxation == "zeroary":
+            relaxed.append(fd.pddl.conditions.Atom(atom.predicate, []))
+        else:
+            relaxed.append(atom)
+    return relaxed
 
 
 def backward_filter(rules):
@@ -976,22 +915,23 @@ def backward_filter(rules):
 
 
 class Heurisitc:
+    """
+    The heuristics of H_NAMES, computed in-process by exploring the datalog program of the domain with the
+    integrated action sequence: h_max (HMAX), h_add (HADD), h_FF on the achievers of h_add (HFF) and LM-cut
+    (G_LM_CUT). The relaxed exploration reaches the same facts as a grounding of the program, so the lifted (L_)
+    and grounded (G_) variants of a heuristic have the same values. With use_ff, h_max and h_add are turned
+    into h_FF on their achievers.
+    """
     def __init__(self, h_name, relaxation, use_ff=False):
+        assert h_name in H_NAMES, "Value error."
         self.h_name = h_name
         self.relaxation = relaxation
-        self.no_legacy = True
         self.use_ff = use_ff
 
     def get_val(self, domain, task):
-        if self.no_legacy:
-            return self.new_get_val(domain, task)
-        else:
-            return self.legacy_get_val()
-
-    def new_get_val(self, domain, task):
         add_goal_rule(domain, task)
         add_free_atom(task, domain)
-        dl_rules = pddl_to_datalog_rules(domain)
+        dl_rules = pddl_to_datalog_rules(domain, self.h_name == "G_LM_CUT")
         cover_head_rule(dl_rules)
 
         unary_dict = None
@@ -1008,72 +948,29 @@ class Heurisitc:
             verify_join_tree(binarized_dl_rules)
             log_stats(binarized_dl_rules)
 
-        return dl_exploration(task.init,
-                              binarized_dl_rules,
-                              max if "HMAX" in self.h_name else lambda x,y: x+y,
-                              self.relaxation == "unary",
-                              self.use_ff,
-                              unary_dict)
-
-    def legacy_get_val(self):
-        GROUND_CMD = {
-            "domain": INPUT_MODEL_DOMAIN,
-            "problem": INPUT_MODEL_PROBLEM,
-            "theory_outp": DATALOG_THEORY,
-            "model_outp": DATALOG_MODEL,
-            "domain_print": OUTPUT_MODEL_DOMAIN,
-            "problem_print": OUTPUT_MODEL_PROBLEM,
-            "lpopt_enabled": True
-        }
-
-        if self.h_name.startswith("L_"):
-            # Calling the grounder with executable 'none' executes all of its preprocessing steps and generates the
-            # according datalog and .pddl files, but does not actually ground the problem yet
-            GROUND_CMD["grounder"] = 'none'
-        else:
-            assert self.h_name.startswith("G_"), (f"{self.h_name} should either start with L_ to indicate a lifted"
-                                                  "or G to indicate a grounded heuristic")
-            # For now we also do not use the efficient grounder, as we would have to do an additional translation
-            # the splitting by lpopt should suffice to make the FD grounder sufficiently performant for
-            # a first evaluation
-            GROUND_CMD["grounder"] = 'none'
-
-        if self.relaxation:
-            GROUND_CMD["relaxation"] = self.relaxation
+        program = DatalogProgram(binarized_dl_rules, self.relaxation == "unary")
+        return self.explore(program, program.compress_init(task.init), unary_dict)
 
-        with timing("Grounding/Transforimng", block=True):
-            ground(**GROUND_CMD)
-
-        dprint("GROUNDED", "now computing heuristic")
-
-        with timing("Calculating heuristic value", block=True):
-            if self.h_name.startswith("L_"):
-                val = get_pwl_value(self.h_name, OUTPUT_MODEL_DOMAIN, OUTPUT_MODEL_PROBLEM)
-            else:
-                val = get_fd_value(self.h_name, OUTPUT_MODEL_DOMAIN, OUTPUT_MODEL_PROBLEM)
-        return val
+    def explore(self, program, init, unary_dict, first_step=0):
+        """The value of the compressed facts init in program, see DatalogProgram.explore."""
+        if self.h_name == "G_LM_CUT":
+            return program.lm_cut(init, first_step)
+        return program.explore(init,
+                               max if "HMAX" in self.h_name else operator.add,
+                               self.use_ff or self.h_name.endswith("HFF"),
+                               unary_dict,
+                               first_step)
 
     def re_run(self, __domain, __task, action_sequence):
         assert False, "With our current construction we should never be able to return infty"
 
-        if not self.no_legacy:
-            shutil.copyfile(OUTPUT_MODEL_DOMAIN, OLD_OUTPUT_MODEL_DOMAIN)
-            shutil.copyfile(OUTPUT_MODEL_PROBLEM, OLD_OUTPUT_MODEL_PROBLEM)
-
         domain = copy.deepcopy(__domain) # verbose
         task = copy.deepcopy(__task) # verbose
 
         integrate_pre_repair(domain, task, action_sequence[0])
-
-        if self.no_legacy:
-            integrate_repair_actions(domain)
-
+        integrate_repair_actions(domain)
         revert_to_fd_structure(domain, task)
 
-        if not self.no_legacy:
-            print_domain(domain, INPUT_MODEL_DOMAIN)
-            print_problem(task, INPUT_MODEL_PROBLEM)
-
         # hack to evaluate this with h_add
         old_h = self.h_name
         self.h_name = self.h_name[:2] + "HADD"
@@ -1086,31 +983,21 @@ class Heurisitc:
 
     def evaluate(self, __domain, __task, action_sequence):
         with timing("Copying domain and task", block=True):
-            domain = copy.deepcopy(__domain) # verbose
-            task = copy.deepcopy(__task) # verbose
+            domain, task = copy_for_integration(__domain, __task)
 
         with timing("Integrating action sequence", block=True):
             integrate_action_sequence(domain, task, action_sequence)
 
-
-        if self.no_legacy:
-            with timing("Adding repair actions", block=True):
-                integrate_repair_actions(domain)
+        with timing("Adding repair actions", block=True):
+            integrate_repair_actions(domain)
 
         # Here we revert Songtuans datastructure to match the original FD translator format again
-        # This allows us to use the provided printout functions of the translator
-        # To pass it on to another program as .pddl
         # ---
         # Copying here is definetly a big performance bottle neck
         # But we ignore this for now
         with timing("Reverting to FD structure", block=True):
             revert_to_fd_structure(domain, task)
 
-        with timing("Dumping files", block=True):
-            if not self.no_legacy:
-                print_domain(domain, INPUT_MODEL_DOMAIN)
-                print_problem(task, INPUT_MODEL_PROBLEM)
-
         try:
             val = self.get_val(domain, task)
         except Exception as e:
@@ -1124,3 +1011,98 @@ class Heurisitc:
             raise
 
         return val
+
+    def evaluate_batch(self, __domain, __task, inputs):
+        """
+        The values of the (state, action_sequence) pairs of inputs, e.g. the children of one expansion, as
+        evaluate() would compute them for __task with each state as its initial state. The datalog program of
+        every distinct action sequence is built once and explored from all of its states, which shares the
+        rules, the compression of predicates and objects and the type predicates across the batch. h_add and
+        h_max values are unchanged; an h_FF value may break ties between equally cheap achievers differently.
+        """
+        programs = {}
+        values = []
+        for state, action_sequence in inputs:
+            key = tuple(tuple(action) for action in action_sequence)
+            if key not in programs:
+                programs[key] = CompiledHeuristic(self.h_name, self.relaxation, __domain, __task, action_sequence,
+                                                  self.use_ff, vectorize=False)
+            values.append(programs[key].evaluate_state(state, action_sequence))
+        return values
+
+
+class CompiledHeuristic(Heurisitc):
+    """
+    Heuristic for the suffixes of a single lifted plan. The datalog program of the whole plan is built once.
+    The suffix starting at plan step k is evaluated by starting the plan step counter at k and ignoring the
+    rules of the earlier steps, so that only the current state is fed into the exploration. With incremental,
+    consecutive evaluations of the same plan step, such as the children of an expansion, reuse the costs of the
+    previous ones where they can. Without vectorize, the program is only explored by the indexed join engine,
+    which is cheaper for programs that are evaluated a few times.
+    """
+    def __init__(self, h_name, relaxation, domain, task, action_sequence, use_ff=False, incremental=False,
+                 vectorize=True):
+        super().__init__(h_name, relaxation, use_ff)
+        self.action_sequence = list(action_sequence)
+
+        with timing("Compiling heuristic", block=True):
+            domain, task = copy_for_integration(domain, task)
+            num_state_atoms = len(task.init)
+            objects = set(obj.name for obj in itertools.chain(task.objects, domain.constants))
+
+            integrate_action_sequence(domain, task, self.action_sequence)
+            integrate_repair_actions(domain)
+            revert_to_fd_structure(domain, task)
+            add_goal_rule(domain, task)
+            add_free_atom(task, domain)
+
+            # everything added to the state besides the plan step counter is the same for every suffix.
+            # The plan step numbers only occur in the counter atoms; binding them to unconstrained parameters
+            # derives facts that never contribute to the goal, and the whole plan has one number per step.
+            step_nums = set(make_num(i) for i in range(len(self.action_sequence) + 2)) - objects
+            static_init = [atom for atom in task.init[num_state_atoms:]
+                           if atom.predicate != COUNTER_PRED and not (atom.predicate == ANY_OBJ and atom.args[0] in step_nums)]
+            static_init = relax_atoms(static_init, relaxation)
+
+            dl_rules = pddl_to_datalog_rules(domain, h_name == "G_LM_CUT")
+            cover_head_rule(dl_rules)
+
+            init = list(task.init)
+            self.unary_dict = None
+            if relaxation == "unary":
+                self.unary_dict = unary_relax(init, dl_rules)
+            elif relaxation == "zeroary":
+                zeroary_relax(init, dl_rules)
+
+            backward_filter(dl_rules)
+            assert dl_rules
+            binarized_dl_rules = binarize_datalog(dl_rules, init, self.unary_dict)
+
+            if DEBUG:
+                verify_join_tree(binarized_dl_rules)
+                log_stats(binarized_dl_rules)
+
+            self.program = DatalogProgram(binarized_dl_rules, relaxation == "unary", vectorize=vectorize,
+                                          incremental=incremental)
+            self.static_init = self.program.compress_init(static_init)
+
+    def evaluate(self, __domain, __task, action_sequence):
+        """
+        Evaluates the initial state of __task for action_sequence, which has to be a suffix of the compiled plan.
+        __domain is the domain the heuristic was compiled for and is not used.
+        """
+        return self.evaluate_state(__task.init, action_sequence)
+
+    def evaluate_batch(self, __domain, __task, inputs):
+        return [self.evaluate_state(state, action_sequence) for state, action_sequence in inputs]
+
+    def evaluate_state(self, state, action_sequence):
+        """Evaluates the atoms state for action_sequence, which has to be a suffix of the compiled plan."""
+        first_step = len(self.action_sequence) - len(action_sequence)
+        assert first_step >= 0 and self.action_sequence[first_step:] == list(action_sequence), \
+            "The action sequence is not a suffix of the compiled plan"
+
+        state = list(state) + [fd.pddl.conditions.Atom(COUNTER_PRED, [make_num(first_step)])]
+        init = self.static_init + self.program.compress_init(relax_atoms(state, self.relaxation))
+
+        return self.explore(self.program, init, self.unary_dict, first_step)
@@ -0,0 +1,131 @@
+"""
+The LM-cut heuristic of Helmert and Domshlak on the ground rules of a relaxed datalog program.
+
+Every ground rule is an add effect of a relaxed ground action with the body facts as preconditions. The rules of
+the add effects of the same ground action share its cost. In every round, the h_max costs are computed with the
+remaining action costs, every rule picks a body fact of maximal cost as its precondition choice, and the actions
+of the rules that lead from the facts reachable from the initial facts into the goal zone, the facts from which
+the goal is reached by rules of cost 0, form a landmark. Its cheapest action cost is added to the value and
+subtracted from the costs of its actions, until the goal costs 0.
+"""
+import heapq
+
+_INF = float('inf')
+
+
+def _hmax(num_facts, heads, bodies, rule_action, costs, uses, init):
+    """The h_max cost of every fact and the precondition choice of every rule, None for unreached rules."""
+    cost = [_INF] * num_facts
+    done = [False] * num_facts
+    missing = [len(body) for body in bodies]
+    choice = [None] * len(heads)
+    queue = []
+    for fact in init:
+        if cost[fact] != 0:
+            cost[fact] = 0
+            queue.append((0, fact))
+    heapq.heapify(queue)
+    while queue:
+        fact_cost, fact = heapq.heappop(queue)
+        if done[fact]:
+            continue
+        done[fact] = True
+        for rule in uses[fact]:
+            missing[rule] -= 1
+            if missing[rule]:
+                continue
+            # the facts are done in the order of their costs, so the last body fact is one of maximal cost
+            choice[rule] = fact
+            head = heads[rule]
+            head_cost = fact_cost + costs[rule_action[rule]]
+            if head_cost < cost[head]:
+                cost[head] = head_cost
+                heapq.heappush(queue, (head_cost, head))
+    return cost, choice
+
+
+def lm_cut(ground_rules, init, goal):
+    """
+    The LM-cut value of the fact goal from the facts init, None if goal is not reached. ground_rules are
+    (head, body facts, cost, action) tuples over hashable facts, and every rule has at least one body fact. The
+    rules with the same hashable action are the add effects of one ground action and its cost is counted once;
+    a rule with action None is an action of its own.
+
+    >>> lm_cut([('p', ('s',), 1, 'a'), ('q', ('s',), 1, 'a'), ('g', ('p', 'q'), 0, None)], ['s'], 'g')
+    1
+    >>> lm_cut([('p', ('s',), 1, 'a'), ('q', ('s',), 1, 'b'), ('g', ('p', 'q'), 0, None)], ['s'], 'g')
+    2
+    """
+    index = {}
+    action_index = {}
+    heads, bodies, rule_action, costs = [], [], [], []
+    for head, body, rule_cost, action in ground_rules:
+        heads.append(index.setdefault(head, len(index)))
+        bodies.append(tuple(set(index.setdefault(fact, len(index)) for fact in body)))
+        if action is None:
+            rule_action.append(len(costs))
+            costs.append(rule_cost)
+        elif action in action_index:
+            assert costs[action_index[action]] == rule_cost
+            rule_action.append(action_index[action])
+        else:
+            action_index[action] = len(costs)
+            rule_action.append(len(costs))
+            costs.append(rule_cost)
+    init = [index[fact] for fact in init if fact in index]
+    if goal not in index:
+        return None
+    goal = index[goal]
+
+    num_facts = len(index)
+    uses = [[] for _ in range(num_facts)]
+    achievers = [[] for _ in range(num_facts)]
+    for rule, (head, body) in enumerate(zip(heads, bodies)):
+        achievers[head].append(rule)
+        for fact in body:
+            uses[fact].append(rule)
+
+    value = 0
+    while True:
+        cost, choice = _hmax(num_facts, heads, bodies, rule_action, costs, uses, init)
+        if cost[goal] == _INF:
+            return None
+        if cost[goal] == 0:
+            return value
+
+        # the goal zone, backwards from the goal along the rules of cost 0
+        in_zone = [False] * num_facts
+        in_zone[goal] = True
+        stack = [goal]
+        while stack:
+            for rule in achievers[stack.pop()]:
+                fact = choice[rule]
+                if fact is not None and costs[rule_action[rule]] == 0 and not in_zone[fact]:
+                    in_zone[fact] = True
+                    stack.append(fact)
+
+        # the facts reachable from the initial facts without entering the goal zone, and the cut into it
+        chosen_by = [[] for _ in range(num_facts)]
+        for rule, fact in enumerate(choice):
+            if fact is not None:
+                chosen_by[fact].append(rule)
+        reached = [False] * num_facts
+        stack = []
+        for fact in init:
+            if not reached[fact]:
+                reached[fact] = True
+                stack.append(fact)
+        cut = set()
+        while stack:
+            for rule in chosen_by[stack.pop()]:
+                head = heads[rule]
+                if in_zone[head]:
+                    cut.add(rule_action[rule])
+                elif not reached[head]:
+                    reached[head] = True
+                    stack.append(head)
+
+        landmark_cost = min(costs[action] for action in cut)
+        value += landmark_cost
+        for action in cut:
+            costs[action] -= landmark_cost
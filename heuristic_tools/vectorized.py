@@ -0,0 +1,431 @@
+"""
+Vectorized h_add and h_max evaluation of zeroary and unary datalog programs.
+
+When every atom of a binarized program has at most one argument, the program is grounded over the objects once:
+every fact gets an index in a cost array, and every ground rule is a (head, first body fact, second body fact,
+cost) entry of index arrays. A variable that occurs in a single body atom and not in the head is existential;
+such an atom is replaced by an aggregate fact holding the cheapest fact of its predicate, so that no rule is
+grounded over two variables. The least fixpoint of the costs is then computed Bellman-Ford style: the ground rules
+are grouped by the level of the strongly connected component of the predicate of their head, and the levels are
+evaluated in topological order, all ground rules of a level at once. The rules of a level with a cyclic component
+are evaluated until none of their heads gets cheaper. The value of the goal fact is the same as the one of the
+exploration, which finds the least fixpoint too.
+"""
+import numpy as np
+
+# step of the ground rules that are active for every suffix of the plan
+_ALWAYS = np.iinfo(np.int64).max
+# index of the fact that is always true, the second body fact of the rules with one body atom
+_TRUE = 0
+# cyclic levels with fewer ground rules are evaluated completely in every round, which is cheaper than tracking them
+_SEMI_NAIVE_MIN_RULES = 1024
+# an incremental evaluation that has evaluated more than this fraction of the rules falls back to one from scratch
+_DELTA_BUDGET = 0.1
+
+
+def _components(successors):
+    """The strongly connected components of a graph given by its successor sets, in topological order."""
+    # iterative Tarjan, which finds the components in reverse topological order
+    index, low, on_stack, stack, components = {}, {}, set(), [], []
+    for root in successors:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors[root]))]
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = low[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(successors[child])))
+                    break
+                if child in on_stack:
+                    low[node] = min(low[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    low[work[-1][0]] = min(low[work[-1][0]], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while not component or component[-1] != node:
+                        component.append(stack.pop())
+                        on_stack.discard(component[-1])
+                    components.append(component)
+    return components[::-1]
+
+
+def _levels(successors):
+    """
+    The level of every node of a graph given by its successor sets, the length of the longest path to its
+    strongly connected component in the graph of the components, and whether any component of the level is cyclic.
+    """
+    component_of, level_of = {}, []
+    cyclic_levels = set()
+    for i, component in enumerate(_components(successors)):
+        for node in component:
+            component_of[node] = i
+        level_of.append(0)
+    for i, component in enumerate(_components(successors)):
+        level = level_of[component_of[component[0]]]
+        if len(component) > 1 or component[0] in successors[component[0]]:
+            cyclic_levels.add(level)
+        for node in component:
+            for child in successors[node]:
+                j = component_of[child]
+                if j != component_of[node]:
+                    level_of[j] = max(level_of[j], level + 1)
+    return {node: (level_of[component_of[node]], level_of[component_of[node]] in cyclic_levels)
+            for node in successors}
+
+
+def _unique(values):
+    """The sorted distinct values, without the hashing np.unique does on newer NumPy versions."""
+    values = np.sort(values)
+    return values[np.concatenate(([True], values[1:] != values[:-1]))] if len(values) else values
+
+
+def applies(rules):
+    """True if every atom of rules has at most one argument, as after zeroary_relax and unary_relax."""
+    return all(len(atom.args) <= 1 for rule in rules for atom in [rule.head] + list(rule.body))
+
+
+class VectorizedEvaluator:
+    """
+    Evaluates the rules of a zeroary or unary DatalogProgram for h_add and h_max. The rules are grounded over the
+    objects of the first initial state evaluated and grounded again if a later one has new objects.
+
+    With incremental, the costs of an evaluation are kept as the reference for the next one of the same plan step,
+    e.g. of the next sibling of an expansion, which is computed from the facts removed from and added to the
+    initial state, delete and rederive style. The facts whose costs may rise, the removed facts and the heads of
+    the rules using a fact whose cost rose, are checked in the order of their costs: such a fact keeps its cost if
+    a rule derives it from facts that keep theirs, else it is reset. The reset facts are recomputed by their rules,
+    the added facts get cost 0, and the cost decreases are propagated from them, which ends in the same fixpoint as
+    an evaluation from scratch. An update that evaluates more than a tenth of the rules is abandoned for an
+    evaluation from scratch.
+    """
+    def __init__(self, rules, goal_pred, is_var, incremental=False):
+        assert applies(rules), "Value error."
+        self.rules = rules
+        self.goal_pred = goal_pred
+        self.is_var = is_var
+        self.incremental = incremental
+        self.num_incremental = 0
+        self.num_from_scratch = 0
+        self.integral = all(float(rule.cost).is_integer() for rule in rules)
+
+        self.arities = {}
+        constants = set()
+        for rule in rules:
+            for atom in [rule.head] + list(rule.body):
+                self.arities.setdefault(atom.predicate, len(atom.args))
+                constants.update(arg for arg in atom.args if not is_var(arg))
+        self.objects = {}
+        self._ground(constants)
+
+    def _ground(self, objects):
+        for obj in sorted(objects, key=repr):
+            self.objects.setdefault(obj, len(self.objects))
+        num_objects = len(self.objects)
+        positions = np.arange(num_objects, dtype=np.int64)
+
+        self.base = {}
+        self.size = _TRUE + 1
+        for pred, arity in self.arities.items():
+            self.base[pred] = self.size
+            self.size += num_objects if arity else 1
+        aggregates = {}
+
+        # the ground rules of every rule, and the graph of the predicates and aggregates they connect
+        groups = []
+        successors = {node: set() for node in self.arities}
+
+        def add(head, head_node, body, body_nodes, cost, step, count):
+            groups.append((head, head_node, body[0], body[1] if len(body) == 2 else _TRUE, cost, step, count))
+            for node in body_nodes:
+                successors[node].add(head_node)
+
+        def aggregate(pred):
+            if pred not in aggregates:
+                aggregates[pred] = self.size
+                self.size += 1
+                successors[('aggregate', pred)] = set()
+                add(aggregates[pred], ('aggregate', pred), [self.base[pred] + positions], [pred], 0, _ALWAYS,
+                    num_objects)
+            return aggregates[pred]
+
+        for rule in self.rules:
+            body_vars = [atom.args[0] if atom.args and self.is_var(atom.args[0]) else None for atom in rule.body]
+            head_var = rule.head.args[0] if rule.head.args and self.is_var(rule.head.args[0]) else None
+            grounded = set(var for var in body_vars if var is not None and (var == head_var or body_vars.count(var) > 1))
+            assert len(grounded) <= 1 and (head_var is None or head_var in grounded), "Value error."
+
+            body, body_nodes = [], []
+            for atom, var in zip(rule.body, body_vars):
+                if not atom.args:
+                    body.append(self.base[atom.predicate])
+                elif var is None:
+                    body.append(self.base[atom.predicate] + self.objects[atom.args[0]])
+                elif var in grounded:
+                    body.append(self.base[atom.predicate] + positions)
+                else:
+                    body.append(aggregate(atom.predicate))
+                    body_nodes.append(('aggregate', atom.predicate))
+                    continue
+                body_nodes.append(atom.predicate)
+            if head_var is not None:
+                head = self.base[rule.head.predicate] + positions
+            elif rule.head.args:
+                head = self.base[rule.head.predicate] + self.objects[rule.head.args[0]]
+            else:
+                head = self.base[rule.head.predicate]
+            add(head, rule.head.predicate, body, body_nodes, rule.cost, _ALWAYS if rule.step is None else rule.step,
+                num_objects if grounded else 1)
+
+        levels = _levels(successors)
+        self.heads = np.concatenate([np.broadcast_to(group[0], group[6]) for group in groups])
+        self.firsts = np.concatenate([np.broadcast_to(group[2], group[6]) for group in groups])
+        self.seconds = np.concatenate([np.broadcast_to(group[3], group[6]) for group in groups])
+        self.costs = np.concatenate([np.full(group[6], group[4], dtype=np.float64) for group in groups])
+        self.steps = np.concatenate([np.full(group[6], group[5], dtype=np.int64) for group in groups])
+        self.levels = np.concatenate([np.full(group[6], levels[group[1]][0], dtype=np.int64) for group in groups])
+        self.cyclic_levels = set(level for level, cyclic in levels.values() if cyclic)
+        self.goal = self.base[self.goal_pred]
+        self._selections = {}
+        self._deltas = {}
+        self._reference = None
+
+    def _selection(self, first_step):
+        """
+        The ground rules of the plan steps from first_step on, per level in topological order: their body facts,
+        costs and heads, the starts of their groups of equal heads, whether the level is cyclic and, for large
+        cyclic levels, their uses (see _uses), else None.
+        """
+        selection = self._selections.get(first_step)
+        if selection is None:
+            active = np.flatnonzero(self.steps >= first_step)
+            order = active[np.lexsort((self.heads[active], self.levels[active]))]
+            levels = self.levels[order]
+            level_starts = np.flatnonzero(np.concatenate(([True], levels[1:] != levels[:-1]))) if len(order) else []
+            selection = []
+            for start, end in zip(level_starts, list(level_starts[1:]) + [len(order)]):
+                part = order[start:end]
+                firsts, seconds, heads = self.firsts[part], self.seconds[part], self.heads[part]
+                starts = np.flatnonzero(np.concatenate(([True], heads[1:] != heads[:-1])))
+                cyclic = levels[start] in self.cyclic_levels
+                uses = self._uses(firsts, seconds) if cyclic and len(part) >= _SEMI_NAIVE_MIN_RULES else None
+                selection.append((firsts, seconds, self.costs[part], heads, starts, cyclic, uses))
+            self._selections[first_step] = selection
+        return selection
+
+    def _uses(self, firsts, seconds):
+        """The rules of every body fact, as the index pointers and positions of a compressed sparse row matrix."""
+        facts = np.concatenate((firsts, seconds))
+        positions = np.tile(np.arange(len(firsts)), 2)
+        pointers = np.concatenate(([0], np.cumsum(np.bincount(facts, minlength=self.size))))
+        return pointers, positions[np.argsort(facts, kind='stable')]
+
+    def _delta_rules(self, first_step):
+        """
+        The ground rules of the plan steps from first_step on, sorted by head, with their uses and the index
+        pointers of the rules of every head.
+        """
+        rules = self._deltas.get(first_step)
+        if rules is None:
+            active = np.flatnonzero(self.steps >= first_step)
+            order = active[np.argsort(self.heads[active], kind='stable')]
+            firsts, seconds, heads = self.firsts[order], self.seconds[order], self.heads[order]
+            rules = (firsts, seconds, self.costs[order], heads, self._uses(firsts, seconds),
+                     np.searchsorted(heads, np.arange(self.size + 1)))
+            self._deltas[first_step] = rules
+        return rules
+
+    @staticmethod
+    def _gather(pointers, positions, facts):
+        """The positions of the rows of facts of a compressed sparse row matrix."""
+        begins = pointers[facts]
+        counts = pointers[facts + 1] - begins
+        total = counts.sum()
+        return positions[np.repeat(begins - np.cumsum(counts) + counts, counts) + np.arange(total)]
+
+    def _propagate(self, cost, changed, combine, firsts, seconds, rule_costs, heads, uses, budget=None):
+        """
+        Lowers the costs of the heads of the rules sorted by head until no cost changes, in rounds that only
+        evaluate the rules with a body fact in changed, the facts that got cheaper in the last round. Returns
+        the remaining budget, or None if more than budget rules would have been evaluated, leaving the costs
+        partially propagated.
+        """
+        pointers, positions = uses
+        while len(changed):
+            rules = _unique(self._gather(pointers, positions, changed))
+            if not len(rules):
+                break
+            if budget is not None:
+                budget -= len(rules)
+                if budget < 0:
+                    return None
+            values = combine(cost[firsts[rules]], cost[seconds[rules]])
+            values += rule_costs[rules]
+            rule_heads = heads[rules]
+            starts = np.flatnonzero(np.concatenate(([True], rule_heads[1:] != rule_heads[:-1])))
+            best = np.minimum.reduceat(values, starts)
+            rule_heads = rule_heads[starts]
+            improved = best < cost[rule_heads]
+            changed = rule_heads[improved]
+            cost[changed] = best[improved]
+        return budget
+
+    def _evaluate_heads(self, cost, facts, combine, rules):
+        """
+        The facts among facts that have rules, sorted, the cheapest values of their rules and the number of rules
+        evaluated.
+        """
+        firsts, seconds, rule_costs, heads, _, head_pointers = rules
+        facts = facts[head_pointers[facts + 1] > head_pointers[facts]]
+        if not len(facts):
+            return facts, np.zeros(0), 0
+        used = self._gather(head_pointers, np.arange(len(heads)), np.sort(facts))
+        values = combine(cost[firsts[used]], cost[seconds[used]])
+        values += rule_costs[used]
+        rule_heads = heads[used]
+        starts = np.flatnonzero(np.concatenate(([True], rule_heads[1:] != rule_heads[:-1])))
+        return rule_heads[starts], np.minimum.reduceat(values, starts), len(used)
+
+    def _update(self, cost, is_init, removed, added, combine, rules, budget):
+        """
+        Updates the fixpoint cost of the initial state is_init (a mask of the facts) to the removal and the
+        addition of the facts at the indices removed and added, see the class. False if budget was exceeded.
+        """
+        _, _, _, _, (pointers, positions), _ = rules
+        is_init[removed] = False
+        is_init[added] = True
+
+        # candidates whose cost may rise are checked in the order of their costs, together with the facts of the
+        # same cost that depend on them. A candidate keeps its cost if a rule derives it from facts that keep
+        # theirs, so that candidates supported only by each other don't. The others are reset, and the heads of
+        # their rules become candidates.
+        heads = rules[3]
+        in_check = np.zeros(self.size, dtype=bool)
+        buckets = {0.0: [removed]}
+        reset = []
+        while buckets:
+            level = min(buckets)
+            candidates = _unique(np.concatenate(buckets.pop(level)))
+            candidates = candidates[(cost[candidates] == level) & ~is_init[candidates]]
+            frontier = candidates
+            in_check[candidates] = True
+            while len(frontier):
+                used = self._gather(pointers, positions, frontier)
+                budget -= len(used)
+                if budget < 0:
+                    return False
+                frontier = _unique(heads[used])
+                frontier = frontier[(cost[frontier] == level) & ~is_init[frontier] & ~in_check[frontier]]
+                in_check[frontier] = True
+                candidates = np.concatenate((candidates, frontier))
+            in_check[candidates] = False
+            if not len(candidates):
+                continue
+            cost[candidates] = np.inf
+            pending = candidates
+            while len(pending):
+                facts, best, num_used = self._evaluate_heads(cost, pending, combine, rules)
+                budget -= num_used
+                if budget < 0:
+                    return False
+                supported = facts[best <= level]
+                if not len(supported):
+                    break
+                cost[supported] = level
+                pending = pending[cost[pending] > level]
+            if not len(pending):
+                continue
+            reset.append(pending)
+            dependents = _unique(heads[self._gather(pointers, positions, pending)])
+            dependents = dependents[np.isfinite(cost[dependents])]
+            for dependent_level in _unique(cost[dependents]):
+                buckets.setdefault(dependent_level, []).append(dependents[cost[dependents] == dependent_level])
+
+        # the costs of the reset facts by their rules, from the facts that kept theirs, and the added facts
+        changed = [added[cost[added] > 0]]
+        cost[changed[0]] = 0
+        if reset:
+            facts, best, num_used = self._evaluate_heads(cost, np.concatenate(reset), combine, rules)
+            budget -= num_used
+            if budget < 0:
+                return False
+            improved = best < cost[facts]
+            cost[facts[improved]] = best[improved]
+            changed.append(facts[improved])
+        return self._propagate(cost, _unique(np.concatenate(changed)), combine, *rules[:5], budget) is not None
+
+    def _indices(self, facts):
+        return np.array([self.base[pred] + (self.objects[args[0]] if args else 0) for pred, args in facts],
+                        dtype=np.int64)
+
+    def _fixpoint(self, init, combine, first_step):
+        cost = np.full(self.size, np.inf)
+        cost[_TRUE] = 0
+        cost[self._indices(init)] = 0
+        for firsts, seconds, rule_costs, heads, starts, cyclic, uses in self._selection(first_step):
+            values = combine(cost[firsts], cost[seconds])
+            values += rule_costs
+            best = np.minimum.reduceat(values, starts)
+            group_heads = heads[starts]
+            if not cyclic:
+                cost[group_heads] = np.minimum(best, cost[group_heads])
+                continue
+            improved = best < cost[group_heads]
+            while improved.any():
+                changed = group_heads[improved]
+                cost[changed] = best[improved]
+                if uses is not None:
+                    # semi-naive rounds: only the rules with a body fact that got cheaper are evaluated again
+                    self._propagate(cost, changed, combine, firsts, seconds, rule_costs, heads, uses)
+                    break
+                values = combine(cost[firsts], cost[seconds])
+                values += rule_costs
+                best = np.minimum.reduceat(values, starts)
+                improved = best < cost[group_heads]
+        return cost
+
+    def evaluate(self, init, additive, first_step=0):
+        """
+        The h_add (additive) or h_max value of the goal fact from the compressed facts init, None if it is not
+        reached. The rules of plan steps before first_step are ignored.
+        """
+        new_objects = set(args[0] for _, args in init if args and args[0] not in self.objects)
+        if new_objects:
+            self._ground(new_objects)
+        combine = np.add if additive else np.maximum
+
+        if not self.incremental:
+            return self._value(self._fixpoint(init, combine, first_step))
+
+        facts = frozenset(init)
+        reference = self._reference
+        if reference is not None and reference[:2] == (first_step, additive):
+            _, _, reference_facts, is_init, reference_cost = reference
+            cost, is_init = reference_cost.copy(), is_init.copy()
+            rules = self._delta_rules(first_step)
+            if self._update(cost, is_init, self._indices(reference_facts - facts), self._indices(facts - reference_facts),
+                            combine, rules, _DELTA_BUDGET * len(rules[0])):
+                self.num_incremental += 1
+                self._reference = (first_step, additive, facts, is_init, cost)
+                return self._value(cost)
+
+        self.num_from_scratch += 1
+        cost = self._fixpoint(facts, combine, first_step)
+        is_init = np.zeros(self.size, dtype=bool)
+        is_init[self._indices(facts)] = True
+        self._reference = (first_step, additive, facts, is_init, cost)
+        return self._value(cost)
+
+    def _value(self, cost):
+        value = cost[self.goal]
+        if np.isinf(value):
+            return None
+        return int(value) if self.integral else float(value)
@@ -0,0 +1,71 @@
+# Compares the MaxSAT hitter backends on the vanilla (fully ground) repairs of a benchmark set.
+# Run from the repository root: python -m hitter.hitter_comparison [benchmark_path] [domain_class]
+import signal
+import sys
+import time
+from pathlib import Path
+from model.plan import PositivePlan
+from repairer import Repairer
+from hitter.maxsat import HITTER_BACKENDS
+from exptools import list_instances
+
+
+class RepairTimeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise RepairTimeout()
+
+
+def vanilla_repair(instance, backend, timeout_seconds):
+    domain = instance.planning_domain.copy()
+    task = instance.planning_task.copy()
+    with open(instance.white_plan_file, 'r') as f:
+        ground_action_sequence = f.read().split('\n')
+    plan = [PositivePlan(ground_action_sequence)]
+
+    repairer = Repairer(backend)
+    signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.alarm(timeout_seconds)
+    start_time = time.time()
+    try:
+        succeed = repairer.repair(domain, [(task, plan)])
+    except RepairTimeout:
+        return 'timeout', time.time() - start_time
+    except Exception:
+        return 'error', time.time() - start_time
+    finally:
+        signal.alarm(0)
+    if not succeed:
+        return None, time.time() - start_time
+    return repairer.count_repair_lines(), time.time() - start_time
+
+
+def experiment(benchmark_path, domain_class=None, timeout_seconds=10):
+    backends = list(HITTER_BACKENDS)
+    total_times = {backend: 0.0 for backend in backends}
+    mismatches = []
+
+    print("instance".ljust(70) + "".join(backend.rjust(18) for backend in backends))
+    for instance in list_instances(benchmark_path, domain_class=domain_class):
+        instance.load_to_memory()
+        costs = {}
+        row = instance.identifier.ljust(70)
+        for backend in backends:
+            costs[backend], elapsed = vanilla_repair(instance, backend, timeout_seconds)
+            total_times[backend] += elapsed
+            row += "{:>8} {:8.3f}s".format(str(costs[backend]), elapsed)
+        print(row, flush=True)
+        if len(set(costs.values())) > 1:
+            mismatches.append(instance.identifier)
+
+    print()
+    print("total".ljust(70) + "".join("{:17.3f}s".format(total_times[backend]) for backend in backends))
+    print("instances with different repair costs (timeouts included): {}".format(mismatches if mismatches else "none"))
+
+
+if __name__ == "__main__":
+    benchmark_path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path('./input/benchmarks-G1')
+    domain_class = sys.argv[2] if len(sys.argv) > 2 else None
+    experiment(benchmark_path, domain_class)
@@ -1,5 +1,6 @@
 from pysat.formula import WCNF
 from pysat.examples.fm import FM
+from pysat.examples.rc2 import RC2
 from typing import List
 
 
@@ -16,4 +17,40 @@ class MaxSATHitter:
     def top(self):
         solver = FM(self._wcnf)
         _ = solver.compute()
-        return [e for e in solver.model if e > 0]
\ No newline at end of file
+        return [e for e in solver.model if e > 0]
+
+
+class RC2Hitter(MaxSATHitter):
+    """Solves the whole formula from scratch with RC2 on every call to top()."""
+    def top(self):
+        with RC2(self._wcnf) as solver:
+            model = solver.compute()
+        return [e for e in model if e > 0]
+
+
+class IncrementalRC2Hitter:
+    """
+    Keeps a single incremental RC2 solver alive. Conflicts are added to it directly,
+    so the cores and learned clauses of earlier calls to top() are reused.
+    """
+    def __init__(self):
+        self._solver = RC2(WCNF(), incr=True)
+
+    def add_conflict(self, conflict: List[int], weight=None):
+        self._solver.add_clause(conflict, weight)
+
+    def top(self):
+        model = self._solver.compute()
+        return [e for e in model if e > 0]
+
+
+HITTER_BACKENDS = {
+    'fm': MaxSATHitter,
+    'rc2': RC2Hitter,
+    'rc2-incremental': IncrementalRC2Hitter,
+}
+
+
+def create_hitter(backend='fm'):
+    assert backend in HITTER_BACKENDS, "Value error."
+    return HITTER_BACKENDS[backend]()
@@ -0,0 +1,94 @@
+"""
+Runs instance_solver.solve_instance in processes forked from a warm server.
+
+Starting `python instance_solver.py` for every instance pays for the interpreter start, the imports of
+pysat, lifted_pddl, tarski and fd and the parsing of the config file. Here a forkserver process imports
+instance_solver once, and every instance is solved in a child forked from it. The child sets its own
+memory limit and is killed when it runs out of time, so a crash only ends its own instance.
+
+Failures are reported with the exceptions of subprocess.run, so callers handle them in the same way:
+subprocess.TimeoutExpired on a timeout and subprocess.CalledProcessError on a non-zero exit code
+(negative for the signal that killed the child), both with the captured stdout and stderr.
+"""
+import logging
+import multiprocessing
+import multiprocessing.forkserver
+import os
+import subprocess
+import tempfile
+import yaml
+
+
+_context = multiprocessing.get_context('forkserver')
+_context.set_forkserver_preload(['__main__', 'instance_solver'])
+
+
+def warm_up():
+    """Starts the fork server of the calling process, so that the first instance does not wait for the imports."""
+    multiprocessing.forkserver.ensure_running()
+
+
+def load_config(config_file):
+    with open(config_file, 'r') as f:
+        return yaml.safe_load(f)
+
+
+def _solve(config_file, config, instance_id, stdout_file, stderr_file):
+    """Entry point of the child process."""
+    import instance_solver
+
+    for path, fd in ((stdout_file, 1), (stderr_file, 2)):
+        if path is not None:
+            with open(path, 'w') as f:
+                os.dup2(f.fileno(), fd)
+    instance_solver.limit_memory()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    instance_solver.solve_instance(config_file=config_file, instance_id=instance_id, config=config)
+
+
+def _read(path):
+    if path is None:
+        return None
+    try:
+        with open(path, 'r', errors='replace') as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+
+def _output_file(capture_output, prefix):
+    if not capture_output:
+        return None
+    fd, path = tempfile.mkstemp(prefix=prefix)
+    os.close(fd)
+    return path
+
+
+def solve(config_file, instance_id, timeout, config=None, capture_output=True):
+    """
+    Solves instance_id in a child of the fork server, as `python instance_solver.py config_file instance_id`
+    would. config is the parsed config_file; it is read from the file if not given.
+    Returns a subprocess.CompletedProcess with the captured output.
+    """
+    config = config if config is not None else load_config(config_file)
+    cmd = ['instance_solver.solve_instance', str(config_file), instance_id]
+    stdout_file = _output_file(capture_output, 'instance_stdout_')
+    stderr_file = _output_file(capture_output, 'instance_stderr_')
+
+    process = _context.Process(target=_solve,
+                               args=(str(config_file), config, instance_id, stdout_file, stderr_file))
+    process.start()
+    process.join(timeout)
+    timed_out = process.is_alive()
+    if timed_out:
+        process.kill()
+        process.join()
+    returncode = process.exitcode
+    process.close()
+
+    stdout, stderr = _read(stdout_file), _read(stderr_file)
+    if timed_out:
+        raise subprocess.TimeoutExpired(cmd, timeout, output=stdout, stderr=stderr)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, output=stdout, stderr=stderr)
+    return subprocess.CompletedProcess(cmd, returncode, stdout=stdout, stderr=stderr)
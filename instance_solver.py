@@ -1,5 +1,9 @@
-from search_partial_grounding import AStar, Node, DFS, BranchBound
+from search_partial_grounding import AStar, LazyAStar, Node, DFS, BranchBound, TranspositionTable, HeuristicCache, \
+    RepairCache, ObjectSymmetry, DominancePruner
 from search_partial_grounding.baseline_repairer import ground_repair
+from search_partial_grounding.parallel_expander import ParallelExpander
+from search_partial_grounding.checkpoint import Checkpointer
+from heuristic_tools.heuristic import CompiledHeuristic
 from custom_logger import StructuredLogger
 from exptools import list_instances
 from pathlib import Path
@@ -13,6 +17,8 @@ import shutil
 import yaml
 
 
+MEMORY_LIMIT = 8 * 1024 * 1024 * 1024  # 8GB in bytes
+
 pid = os.getpid()
 workspace_path = f'heuristic_tools/aux_files/{pid}'
 
@@ -31,11 +37,16 @@ def cleanup_workspace():
         shutil.rmtree(workspace_path)
 
 
-def solve_instance(config_file, instance_id):
+def limit_memory(size=MEMORY_LIMIT):
+    resource.setrlimit(resource.RLIMIT_AS, (size, size))
+
+
+def solve_instance(config_file, instance_id, config=None, resume=None):
     start_time = time.time()
 
-    with open(config_file, 'r') as config_file:
-        config = yaml.safe_load(config_file)
+    if config is None:
+        with open(config_file, 'r') as config_file:
+            config = yaml.safe_load(config_file)
 
     search_algorithm = config['search_algorithm']
     benchmark_path = Path(config['benchmark_path'])
@@ -43,10 +54,29 @@ def solve_instance(config_file, instance_id):
     heuristic_relaxation = config['heuristic_relaxation']
     use_ff = config['use_ff']
     successor_generator = config['successor_generator']
+    use_closed_set = config.get('closed_set', False)
+    use_transposition_table = config.get('transposition_table', False)
+    incremental_repair = config.get('incremental_repair', False)
+    hitter_backend = config.get('hitter_backend', 'fm')
+    grounder = config.get('grounder', 'lifted_pddl')
+    compiled_heuristic = config.get('compiled_heuristic', False)
+    incremental_heuristic = config.get('incremental_heuristic', False)
+    batch_heuristic = config.get('batch_heuristic', False)
+    parallel_workers = config.get('parallel_workers', 0)
+    memory_watermark_mb = config.get('memory_watermark_mb', None)
+    checkpoint_interval = config.get('checkpoint_interval_seconds', 0)
+    heuristic_cache_size = config.get('heuristic_cache_size', 0)
+    heuristic_cache_file = config.get('heuristic_cache_file', None)
+    repair_cache_mb = config.get('repair_cache_mb', 0)
+    repair_cache_file = config.get('repair_cache_file', None)
+    symmetry_reduction = config.get('symmetry_reduction', False)
+    dominance_pruning = config.get('dominance_pruning', 'none')
+    resume = config.get('resume', False) if resume is None else resume
 
     log_interval = config['log_interval']
     log_folder = Path(config['log_folder'])
     log_file = os.path.join(log_folder, f"{instance_id}.yaml")
+    checkpoint_file = os.path.join(log_folder, f"{instance_id}.checkpoint")
     
 
     # setup_process_workspace()
@@ -55,6 +85,18 @@ def solve_instance(config_file, instance_id):
     instance = list_instances(benchmark_path, instance_ids=[instance_id], lift_prob=lift_prob)[0]
     instance.load_to_memory()
     logger = StructuredLogger(log_file)
+
+    checkpointer = None
+    if checkpoint_interval > 0 or resume:
+        checkpointer = Checkpointer(checkpoint_file, checkpoint_interval, resume=resume)
+        if checkpointer.resuming and checkpointer.header["search_algorithm"] != search_algorithm:
+            logger.log(issuer="instance_solver", event_type="checkpoint", level=logging.WARNING,
+                       message=f"Ignoring the checkpoint of {checkpointer.header['search_algorithm']} search.")
+            checkpointer.header = None
+        if checkpointer.resuming:
+            # the lifting of the plan is random, so the resumed search needs the lifted plan of the checkpoint
+            instance.lifted_plan = checkpointer.header["lifted_plan"]
+        checkpointer.metadata = {"search_algorithm": search_algorithm, "lifted_plan": instance.lifted_plan}
     log_data_meta= {
         "log_file": str(log_file),
         "instance_id": instance.identifier,
@@ -72,7 +114,8 @@ def solve_instance(config_file, instance_id):
         gr = ground_repair(
                 instance.planning_domain
                 , instance.planning_task
-                , instance.white_plan_file)
+                , instance.white_plan_file
+                , hitter_backend)
     except Exception as e:
         stack_trace = traceback.format_exc()
         logger.log(issuer="instance_solver"
@@ -93,36 +136,96 @@ def solve_instance(config_file, instance_id):
     Node.set_successor_generator(successor_generator)
     Node.set_heuristic_relaxation(heuristic_relaxation)
     Node.set_use_ff(use_ff)
+    Node.set_incremental_repair(incremental_repair)
+    Node.set_hitter_backend(hitter_backend)
+    Node.set_grounder(grounder)
+    h_cost_needed = False if search_algorithm in ('dfs', 'ucs') else True
+    Node.set_lazy_heuristic(search_algorithm in ('lazy_astar', 'lazy_greedy'))
+    Node.set_batch_heuristic(batch_heuristic)
+    if compiled_heuristic and h_cost_needed:
+        Node.set_heuristic(CompiledHeuristic(
+            h_name='L_HADD',
+            relaxation=heuristic_relaxation,
+            domain=instance.planning_domain,
+            task=instance.planning_task,
+            action_sequence=instance.lifted_plan,
+            use_ff=use_ff,
+            incremental=incremental_heuristic))
+    heuristic_cache = None
+    if heuristic_cache_size > 0 and h_cost_needed:
+        heuristic_cache = HeuristicCache(
+            heuristic_cache_size,
+            path=heuristic_cache_file,
+            namespace=f"{instance_id}|L_HADD|{heuristic_relaxation}|{use_ff}")
+    Node.set_heuristic_cache(heuristic_cache)
+    repair_cache = None
+    if repair_cache_mb > 0:
+        repair_cache = RepairCache(repair_cache_mb, path=repair_cache_file, namespace=instance_id)
+    Node.set_repair_cache(repair_cache)
+    Node.set_symmetry(ObjectSymmetry(instance.planning_domain, instance.planning_task, instance.lifted_plan)
+                      if symmetry_reduction else None)
+    Node.set_dominance_pruner(DominancePruner(dominance_pruning) if dominance_pruning not in (None, 'none') else None)
+    expander = ParallelExpander(parallel_workers) if parallel_workers > 1 else None
+    Node.set_expander(expander)
     initial_node = Node(
         lifted_action_sequence=instance.lifted_plan,
         ground_action_sequence=[],
         parent=None,
         is_initial_node=True,
-        h_cost_needed=False if search_algorithm in ('dfs', 'ucs') else True,
+        h_cost_needed=h_cost_needed,
         heuristic_relaxation=heuristic_relaxation
     )
 
+    transposition_table = TranspositionTable() if use_transposition_table else None
     if search_algorithm == 'astar':
-        searcher = AStar(initial_node, g_cost_multiplier=1, h_cost_multiplier=1)
+        searcher = AStar(initial_node, g_cost_multiplier=1, h_cost_multiplier=1, use_closed_set=use_closed_set,
+                         transposition_table=transposition_table, memory_watermark_mb=memory_watermark_mb)
     elif search_algorithm == 'g_astar':
-        searcher = AStar(initial_node, g_cost_multiplier=1, h_cost_multiplier=2)
+        searcher = AStar(initial_node, g_cost_multiplier=1, h_cost_multiplier=2, use_closed_set=use_closed_set,
+                         transposition_table=transposition_table, memory_watermark_mb=memory_watermark_mb)
     elif search_algorithm == 'ucs':
-        searcher = AStar(initial_node, g_cost_multiplier=1, h_cost_multiplier=0)
+        searcher = AStar(initial_node, g_cost_multiplier=1, h_cost_multiplier=0, use_closed_set=use_closed_set,
+                         transposition_table=transposition_table, memory_watermark_mb=memory_watermark_mb)
     elif search_algorithm == 'greedy':
-        searcher = AStar(initial_node, g_cost_multiplier=0, h_cost_multiplier=1)
+        searcher = AStar(initial_node, g_cost_multiplier=0, h_cost_multiplier=1, use_closed_set=use_closed_set,
+                         transposition_table=transposition_table, memory_watermark_mb=memory_watermark_mb)
+    elif search_algorithm == 'lazy_astar':
+        searcher = LazyAStar(initial_node, g_cost_multiplier=1, h_cost_multiplier=1, use_closed_set=use_closed_set,
+                             transposition_table=transposition_table, memory_watermark_mb=memory_watermark_mb)
+    elif search_algorithm == 'lazy_greedy':
+        searcher = LazyAStar(initial_node, g_cost_multiplier=0, h_cost_multiplier=1, use_closed_set=use_closed_set,
+                             transposition_table=transposition_table, memory_watermark_mb=memory_watermark_mb)
     elif search_algorithm == 'dfs':
-        searcher = DFS(initial_node)
+        searcher = DFS(initial_node, transposition_table=transposition_table)
     elif search_algorithm == 'bb':
-        searcher = BranchBound(initial_node)
+        searcher = BranchBound(initial_node, use_transposition_table=use_transposition_table,
+                               memory_watermark_mb=memory_watermark_mb)
     else:
         raise NotImplementedError("Search algorithm not supported.")
 
+    if checkpointer is not None:
+        searcher.set_checkpointer(checkpointer)
+        if checkpointer.resuming:
+            logger.log(issuer="instance_solver", event_type="checkpoint", level=logging.INFO,
+                       message={"resumed_from": checkpoint_file,
+                                "iteration": checkpointer.header["iteration"],
+                                "elapsed_seconds": checkpointer.header["elapsed_seconds"]})
+
     try:
         searcher.find_path(logger=logger, log_interval=log_interval)
+        if checkpointer is not None:
+            checkpointer.remove()
     except Exception as e:
         stack_trace = traceback.format_exc()
         logger.log(issuer="instance_solver", event_type="error", level=logging.ERROR,
             message=f"An error occurred during A* search: {str(e)}. Stack trace: {stack_trace}")
+    finally:
+        if expander is not None:
+            expander.shutdown()
+        if heuristic_cache is not None:
+            heuristic_cache.close()
+        if repair_cache is not None:
+            repair_cache.close()
     
     # Time measure
     end_time = time.time()
@@ -132,15 +235,16 @@ def solve_instance(config_file, instance_id):
 
 
 if __name__ == "__main__":
-    size = 8 * 1024 * 1024 * 1024  # 8GB in bytes
-    resource.setrlimit(resource.RLIMIT_AS, (size, size))
+    limit_memory()
 
     logging.basicConfig(level=logging.INFO, format='%(message)s')
     
     config_file = sys.argv[1]
     instance_id = sys.argv[2]
+    resume = '--resume' in sys.argv[3:]
 
     solve_instance(
         config_file=config_file,
-        instance_id=instance_id
+        instance_id=instance_id,
+        resume=resume or None
     )
@@ -6,10 +6,10 @@ import sys
 import subprocess
 import yaml
 import datetime
-from multiprocessing import Process
 import logging
 import traceback
 from custom_logger import StructuredLogger
+import instance_pool
 
 
 
@@ -75,21 +75,20 @@ def worker(instance, config_file, params):
 
     log_file = os.path.join(params['log_folder'], f"{instance.identifier}.yaml")
 
-    if os.path.isfile(log_file):
+    if os.path.isfile(log_file) and not params['config'].get('resume', False):
         os.remove(log_file)
     
     logger = StructuredLogger(log_file)
     
     cmd = [
-        sys.executable,
-        "instance_solver.py",
+        "instance_solver.solve_instance",
         str(config_file),
         instance.identifier,
     ]
     
     try:
-        result = subprocess.run(cmd, check=True, timeout=params['timeout_seconds'],
-                                capture_output=True, text=True)
+        result = instance_pool.solve(config_file, instance.identifier, params['timeout_seconds'],
+                                     config=params['config'])
         
         end_time = datetime.datetime.now()
         duration = (end_time - start_time).total_seconds()
@@ -128,7 +127,7 @@ def worker(instance, config_file, params):
         
         is_memory_error = is_memory_related_error(e, stderr=e.stderr if hasattr(e, 'stderr') else None)
         
-        print(f"[{end_time}] Worker {worker_id} {'MEMORY ERROR' if is_memory_error else 'ERROR'} on {instance.identifier} after {duration:.2f} seconds:", flush=True)
+        print(f"[{end_time}] {'MEMORY ERROR' if is_memory_error else 'ERROR'} on {instance.identifier} after {duration:.2f} seconds:", flush=True)
         print(f"Error type: {type(e).__name__}", flush=True)
         print(f"Error message: {str(e)}", flush=True)
         print(f"Stack trace:\n{stack_trace}", flush=True)
@@ -207,11 +206,11 @@ def run_process(config_file, benchmark_path, log_folder, timeout_seconds,
         order, log_folder, timeout_seconds
     )
     
-    # Add tasks to queue
+    # Every instance runs in its own child of the fork server, which has instance_solver already imported
+    params['config'] = instance_pool.load_config(config_file)
+    instance_pool.warm_up()
     for instance in instances:
-        p = Process(target=worker, args=(instance, config_file, params))
-        p.start()
-        p.join()
+        worker(instance, config_file, params)
 
         
     print(f"Finished processing all instances.", flush=True)
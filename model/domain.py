@@ -1,3 +1,4 @@
+import copy
 from fd.pddl.parser import parse_nested_list
 from fd.pddl.tasks import parse_domain, parse_task
 from fd.pddl.conditions import Condition
@@ -71,6 +72,18 @@ class Domain:
     def get_all_actions(self):
         return [self.get_action(name) for name in [a.name for a in self._actions]]
 
+    def replace_action(self, action):
+        # Replace an action in this domain only, until the next update
+        self._updated_actions[action.name] = action
+
+    def copy(self):
+        # The parsed types, constants, predicates and actions are shared with the copy, they are
+        # never modified in place. Repairs and updated actions are set per copy.
+        domain = copy.copy(self)
+        domain._repairs = set(self._repairs)
+        domain._updated_actions = dict(self._updated_actions)
+        return domain
+
     def get_constant(self, name):
         # Return constant if it exists, otherwise return None
         if name not in self._constant_dict:
@@ -153,7 +166,9 @@ class Task:
         return self._obj_dict[name]
 
     def copy(self):
-        return Task(self.to_pddl())
+        # The objects, the initial state and the goal are shared with the copy, they are
+        # never modified in place. Use set_init_state and set_goal_empty to change them.
+        return copy.copy(self)
 
     def set_goal_empty(self):
         self._goal = Condition(tuple())
@@ -33,8 +33,9 @@ def check_goal(state, goal):
     return None
 
 
-def apply_action_sequence(domain: Domain, task: Task, plan, delete_relaxed) -> List[Atom]:
-    state = set(task.init)
+def apply_action_sequence(domain: Domain, task: Task, plan, delete_relaxed, init_state=None) -> List[Atom]:
+    # Apply the plan from init_state, or from the initial state of the task if it is not given
+    state = set(task.init) if init_state is None else set(init_state)
     
     for pos, step in enumerate(plan._steps):
         action = domain.get_action(step[0])
@@ -135,10 +136,10 @@ class PositivePlan(Plan):
     def __init__(self, action_sequence):
         super().__init__(action_sequence)
 
-    def execute(self, domain: Domain, task: Task):
-        # Execute a positive plan
+    def execute(self, domain: Domain, task: Task, init_state=None):
+        # Execute a positive plan, from init_state if it is given
         state = set()
-        for p in task.init:
+        for p in (task.init if init_state is None else init_state):
             state.add(p)
         for pos, step in enumerate(self._steps):
             action = domain.get_action(step[0])
@@ -4,9 +4,44 @@ import logging
 import pprint as pp
 
 
+class RepairContext:
+    """
+    Conflict clauses, repair index maps and the last optimal hitting set of a repair run.
+    Every conflict of a plan is also a conflict of any plan extending it, so the context
+    of a plan can warm start the repair of its extensions.
+    """
+    def __init__(self, clauses=(), repair_to_idx=None, idx_to_repair=None, hitting_set=()):
+        self.clauses = list(clauses)
+        self.repair_to_idx = dict(repair_to_idx or {})
+        self.idx_to_repair = dict(idx_to_repair or {})
+        self.hitting_set = list(hitting_set)
+
+    def copy(self):
+        return RepairContext(self.clauses, self.repair_to_idx, self.idx_to_repair, self.hitting_set)
+
+    def create_hitter(self, backend='fm'):
+        hitter = create_hitter(backend)
+        for clause, weight in self.clauses:
+            hitter.add_conflict(clause, weight)
+        return hitter
+
+    def add_conflict(self, hitter, clause, weight=None):
+        self.clauses.append((clause, weight))
+        hitter.add_conflict(clause, weight)
+
+    def candidate(self):
+        return set(self.idx_to_repair[x] for x in self.hitting_set)
+
+
 class Repairer:
-    def __init__(self):
+    def __init__(self, hitter_backend='fm'):
+        self.hitter_backend = hitter_backend
         self._repairs = None
+        self._context = None
+
+    @property
+    def context(self):
+        return self._context
 
     def repair(self
                , domain: Domain
@@ -16,12 +51,44 @@ class Repairer:
             task, plans = instance
             for plan in plans:
                 plan.compute_subs(domain, task)
-        _repair_to_idx = {}
-        _idx_to_repair = {}
-        hitter = MaxSATHitter()
+        context = RepairContext()
+        return self._repair_loop(domain, instances, context, context.create_hitter(self.hitter_backend))
+
+    def repair_extension(self
+                         , domain: Domain
+                         , task: Task
+                         , action_sequence: List[str]
+                         , context: RepairContext
+                         , prefix_state):
+        """
+        Warm-started repair of action_sequence, whose prefix without the last action was repaired
+        with context and reaches prefix_state under that repair.
+        The last optimal hitting set is kept if the last action (and the goal) is satisfied from
+        prefix_state. Otherwise the search continues from the inherited conflicts.
+        """
+        candidate = context.candidate()
+        domain.repairs = candidate
+        domain.update()
+        last_step = PositivePlan(action_sequence[-1:])
+        last_step.compute_subs(domain, task)
+        if last_step.execute(domain, task, init_state=prefix_state):
+            domain.repaired = True
+            self._repairs = candidate
+            self._context = context
+            return True
+
+        plan = PositivePlan(action_sequence)
+        plan.compute_subs(domain, task)
+        context = context.copy()
+        return self._repair_loop(domain, [(task, [plan])], context, context.create_hitter(self.hitter_backend), candidate)
+
+    def _repair_loop(self, domain, instances, context, hitter, candidate=None):
+        _repair_to_idx = context.repair_to_idx
+        _idx_to_repair = context.idx_to_repair
         while True:
-            candidate = hitter.top()
-            candidate = set(_idx_to_repair[x] for x in candidate)
+            if candidate is None:
+                context.hitting_set = hitter.top()
+                candidate = context.candidate()
             for c in candidate:
                 msg = str(c) + "({})".format(_repair_to_idx[c])
             domain.repairs = candidate
@@ -44,17 +111,19 @@ class Repairer:
                                 idx = len(_repair_to_idx) + 1
                                 _repair_to_idx[r] = idx
                                 _idx_to_repair[idx] = r
-                                hitter.add_conflict([-idx], 1)
+                                context.add_conflict(hitter, [-idx], 1)
                             if r.condition:
                                 conflict.append(-_repair_to_idx[r])
                             else:
                                 conflict.append(_repair_to_idx[r])
                             msg = str(r) + " condition: {} -- {}".format(
                                     r.condition, _repair_to_idx[r])
-                        hitter.add_conflict(conflict)
+                        context.add_conflict(hitter, conflict)
             if domain.repaired:
                 self._repairs = candidate
+                self._context = context
                 return True
+            candidate = None
 
     def print_repairs(self):
         for r in self._repairs:
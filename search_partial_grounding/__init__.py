@@ -1,3 +1,9 @@
-from .search_algorithms import AStar, DFS, BranchBound
+from .search_algorithms import AStar, LazyAStar, DFS, BranchBound
 from .node import Node
+from .open_list import OpenList, SpillingOpenList
+from .transposition_table import TranspositionTable
+from .heuristic_cache import HeuristicCache
+from .repair_cache import RepairCache
+from .symmetry import ObjectSymmetry
+from .dominance import DominancePruner
 from .action_grounding_tools import *
\ No newline at end of file
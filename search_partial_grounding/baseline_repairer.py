@@ -1,19 +1,18 @@
 import os
 from model.plan import *
 from repairer import *
-import copy
 
 
-def ground_repair(domain, task, plan_path):
-    domain = copy.deepcopy(domain)
-    task = copy.deepcopy(task)
+def ground_repair(domain, task, plan_path, hitter_backend='fm'):
+    domain = domain.copy()
+    task = task.copy()
 
     with open(plan_path, 'r') as f:
         ground_action_sequence = f.read()
     ground_action_sequence = ground_action_sequence.split('\n')
     plan = [PositivePlan(ground_action_sequence)]
 
-    repairer = Repairer()
+    repairer = Repairer(hitter_backend)
 
     if repairer.repair(domain, [(task, plan)]):
         r = repairer.get_repairs_string()
@@ -0,0 +1,137 @@
+import io
+import itertools
+import os
+import pickle
+import time
+from fd.pddl.conditions import Condition, ConstantCondition, Literal, QuantifiedCondition
+from fd.pddl.f_expression import PrimitiveNumericExpression
+
+
+def _rehashed(cls, state):
+    """Rebuilds a pddl condition or expression and recomputes the hash it caches."""
+    obj = cls.__new__(cls)
+    obj.__dict__.update(state)
+    if isinstance(obj, Literal):
+        obj.hash = hash((cls, obj.predicate, obj.args))
+    elif isinstance(obj, ConstantCondition):
+        obj.hash = hash(cls)
+    elif isinstance(obj, QuantifiedCondition):
+        obj.hash = hash((cls, obj.parameters, obj.parts))
+    elif isinstance(obj, Condition):
+        obj.hash = hash((cls, obj.parts))
+    else:
+        obj.hash = hash((cls, obj.symbol, obj.args))
+    return obj
+
+
+class _Pickler(pickle.Pickler):
+    # The pddl conditions cache their hash, which is only valid in the process that computed it.
+    def reducer_override(self, obj):
+        if isinstance(obj, (Condition, PrimitiveNumericExpression)) and 'hash' in obj.__dict__:
+            state = {key: value for key, value in obj.__dict__.items() if key != 'hash'}
+            return _rehashed, (type(obj), state)
+        return NotImplemented
+
+
+def dumps(obj):
+    """Pickles obj such that the pddl conditions in it can be loaded in another process."""
+    buffer = io.BytesIO()
+    _Pickler(buffer, pickle.HIGHEST_PROTOCOL).dump(obj)
+    return buffer.getvalue()
+
+
+class Checkpointer:
+    """
+    Writes the state of a search to path every interval seconds, so that a later run can resume it.
+
+    A checkpoint holds a header, i.e. the metadata given by the caller (such as the lifted plan of the
+    instance), the class of the searcher, its iteration, its counters, the repairs seen so far and the
+    BranchBound incumbent, followed by the queued nodes, one (priority, Node.compact()) pair per pickle,
+    so that the frontier is streamed to and from the file. The file is replaced atomically. With resume, the checkpoint at path,
+    if any, is read back by the searcher (see Searcher.start) instead of starting from the initial node.
+    The open list is saved in heap order, so the restored one breaks ties in the same way. The closed set
+    and the transposition table are not saved: the transposition table is rebuilt from the restored nodes.
+    The repair contexts are not saved either, so the children of a restored node repair from scratch; their
+    repairs cost the same, but may be other ones of the same cost.
+    """
+
+    def __init__(self, path, interval, metadata=None, resume=False):
+        self.path = path
+        self.interval = interval
+        self.metadata = metadata or {}
+        self.header = self.read_header(path) if resume else None
+        self.start_time = self.last_save = time.time()
+        self.num_saved = 0
+
+    @property
+    def resuming(self):
+        return self.header is not None
+
+    @property
+    def elapsed_seconds(self):
+        """Search time of this run and of the runs it resumes."""
+        before = self.header['elapsed_seconds'] if self.resuming else 0.0
+        return before + time.time() - self.start_time
+
+    @staticmethod
+    def read_header(path):
+        if not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def due(self):
+        return self.interval > 0 and time.time() - self.last_save >= self.interval
+
+    def save(self, searcher, iteration, entries):
+        """Writes the searcher with its queued entries, an iterable of (priority, detached node) pairs."""
+        node_class = type(searcher.initial_node)
+        incumbent = getattr(searcher, 'incumbent', None)
+        header = dict(self.metadata)
+        header.update({
+            "searcher": type(searcher).__name__,
+            "iteration": iteration,
+            "elapsed_seconds": self.elapsed_seconds,
+            "counters": {name: getattr(searcher, name) for name in searcher.counters},
+            "repairs": node_class.repair_table(),
+            "incumbent": None if incumbent is None else node_class.compact(incumbent.detached(include_state=False)),
+        })
+        compact_entries = ((priority, node_class.compact(detached)) for priority, detached in entries)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickler = _Pickler(f, pickle.HIGHEST_PROTOCOL)
+            for item in itertools.chain([header], compact_entries):
+                pickler.dump(item)
+                pickler.clear_memo()
+        os.replace(tmp_path, self.path)
+        self.last_save = time.time()
+        self.num_saved += 1
+
+    def entries(self):
+        """Yields the (priority, compact node) pairs of the checkpoint read at construction."""
+        with open(self.path, 'rb') as f:
+            pickle.load(f)
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+
+    def restore(self, searcher, push):
+        """Sets the counters of searcher and queues the saved nodes with push(node, priority). Returns the iteration."""
+        header = self.header
+        for name, value in header["counters"].items():
+            setattr(searcher, name, value)
+        root = searcher.initial_node
+        node_class = type(root)
+        if header["incumbent"] is not None:
+            searcher.incumbent = node_class.from_compact(header["incumbent"], root, header["repairs"])
+        for priority, compact in self.entries():
+            node = node_class.from_compact(compact, root, header["repairs"])
+            if searcher.merge_transposition(node):
+                push(node, priority)
+        return header["iteration"]
+
+    def remove(self):
+        if os.path.isfile(self.path):
+            os.remove(self.path)
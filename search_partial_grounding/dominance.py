@@ -0,0 +1,91 @@
+class DominancePruner:
+    """Prunes search nodes whose repairs include the repairs of another node reaching the same state.
+
+    Two nodes at the same depth share the remaining lifted action sequence. If
+    they also reach the same state and the repair set of one is a subset of the
+    repair set of the other, the other node is treated as dominated and dropped.
+    This extends the merging of the TranspositionTable from equal repair sets
+    to included ones.
+
+    The pruning gives up optimality: the repair of a child is computed for its
+    whole ground action sequence, so a child of the dominated node can need
+    fewer repairs than the same child of the dominating one, and the optimal
+    repair can be lost.
+
+    With scope 'siblings', the dominated children of every expanded node are
+    dropped (see prune_siblings). With scope 'open_list', every node is checked
+    against all nodes kept so far with the same depth and state (see insert),
+    and the nodes it dominates are dropped from the open list.
+    """
+
+    def __init__(self, scope='siblings'):
+        assert scope in ['siblings', 'open_list'], "Value error."
+        self.scope = scope
+        self._index = {}
+        self.num_checked = 0
+        self.num_pruned = 0
+        self.num_removed = 0
+
+    @staticmethod
+    def key(node):
+        return node.depth, node.state_key()
+
+    @staticmethod
+    def dominates(node, other):
+        """True if node has the repairs of other or a subset of them."""
+        return node.repair_set <= other.repair_set
+
+    def prune_siblings(self, nodes):
+        """The nodes that are not dominated by another one of them. Of nodes with equal repair sets, the first is kept."""
+        if self.scope != 'siblings':
+            return nodes
+        groups = {}
+        for node in nodes:
+            groups.setdefault(self.key(node), []).append(node)
+        kept = []
+        for node in nodes:
+            group = groups[self.key(node)]
+            if len(group) > 1 and any(
+                    other is not node and self.dominates(other, node)
+                    and (other.repair_set != node.repair_set or group.index(other) < group.index(node))
+                    for other in group):
+                continue
+            kept.append(node)
+        self.num_checked += len(nodes)
+        self.num_pruned += len(nodes) - len(kept)
+        return kept
+
+    def insert(self, node):
+        """
+        Registers ``node`` if no known node dominates it.
+
+        Returns:
+            A pair ``(keep, dominated)``. ``keep`` is False if a known node
+            with the same depth and state dominates ``node``. ``dominated``
+            are the known nodes that ``node`` dominates, which the caller
+            drops from its open list.
+        """
+        self.num_checked += 1
+        kept = self._index.setdefault(self.key(node), [])
+        if any(other is node for other in kept):
+            return True, []
+        if any(self.dominates(other, node) for other in kept):
+            self.num_pruned += 1
+            return False, []
+        dominated = [other for other in kept if self.dominates(node, other)]
+        if dominated:
+            kept[:] = [other for other in kept if not self.dominates(node, other)]
+            self.num_removed += len(dominated)
+        kept.append(node)
+        return True, dominated
+
+    def is_kept(self, node):
+        """False if ``node`` has been dominated by a node registered after it."""
+        kept = self._index.get(self.key(node))
+        return kept is None or any(other is node for other in kept)
+
+    def stats(self):
+        return {
+            "dominance_checked": self.num_checked,
+            "dominance_pruned": self.num_pruned + self.num_removed,
+        }
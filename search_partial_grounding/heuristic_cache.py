@@ -0,0 +1,98 @@
+import hashlib
+import os
+import sqlite3
+from collections import OrderedDict
+
+
+class HeuristicCache:
+    """
+    Bounded LRU cache of heuristic values, keyed on the state of a node and the remaining lifted actions.
+
+    The heuristic is evaluated on the original domain, so nodes with different repairs but the same state and
+    suffix have the same value. In memory the key is the state with the length of the suffix, which identifies
+    the suffix of the single lifted plan of a search. With a file, the values are also stored in a SQLite table
+    under a digest of the sorted state atoms, the suffix and the namespace (the instance and the heuristic
+    settings), so that later runs of the same configuration on the same instance reuse them. The file is only
+    used by the process that created the cache, not by the workers of a ParallelExpander.
+    """
+
+    def __init__(self, max_size, path=None, namespace='', commit_interval=1000):
+        self.max_size = max_size
+        self.path = path
+        self.namespace = namespace
+        self.commit_interval = commit_interval
+        self._values = OrderedDict()
+        self._pid = os.getpid()
+        self._db = None
+        self._num_uncommitted = 0
+        self.num_hits = 0
+        self.num_disk_hits = 0
+        self.num_misses = 0
+
+    def _connection(self):
+        if self.path is None or os.getpid() != self._pid:
+            return None
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, timeout=60)
+            self._db.execute("CREATE TABLE IF NOT EXISTS h_values (key BLOB PRIMARY KEY, value REAL)")
+        return self._db
+
+    def _digest(self, state, suffix):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.namespace.encode())
+        for part in (sorted(str(atom) for atom in state), [str(action) for action in suffix]):
+            digest.update(b'\0' + '\n'.join(part).encode())
+        return digest.digest()
+
+    def get(self, state, suffix):
+        """Returns the cached value for state and the lifted action sequence suffix, or None."""
+        key = (state, len(suffix))
+        value = self._values.get(key)
+        if value is not None:
+            self._values.move_to_end(key)
+            self.num_hits += 1
+            return value
+        db = self._connection()
+        if db is not None:
+            row = db.execute("SELECT value FROM h_values WHERE key = ?", (self._digest(state, suffix),)).fetchone()
+            if row is not None:
+                self.num_disk_hits += 1
+                self._insert(key, row[0])
+                return row[0]
+        self.num_misses += 1
+        return None
+
+    def put(self, state, suffix, value):
+        self._insert((state, len(suffix)), value)
+        db = self._connection()
+        if db is not None:
+            db.execute("INSERT OR REPLACE INTO h_values VALUES (?, ?)", (self._digest(state, suffix), value))
+            self._num_uncommitted += 1
+            if self._num_uncommitted >= self.commit_interval:
+                self.flush()
+
+    def _insert(self, key, value):
+        self._values[key] = value
+        if len(self._values) > self.max_size:
+            self._values.popitem(last=False)
+
+    def flush(self):
+        if self._db is not None and os.getpid() == self._pid:
+            self._db.commit()
+            self._num_uncommitted = 0
+
+    def close(self):
+        self.flush()
+        if self._db is not None and os.getpid() == self._pid:
+            self._db.close()
+            self._db = None
+
+    def stats(self):
+        lookups = self.num_hits + self.num_disk_hits + self.num_misses
+        return {
+            "h_cache_size": len(self._values),
+            "h_cache_hits": self.num_hits,
+            "h_cache_disk_hits": self.num_disk_hits,
+            "h_cache_misses": self.num_misses,
+            "h_cache_hit_rate": (self.num_hits + self.num_disk_hits) / lookups if lookups else 0.0,
+        }
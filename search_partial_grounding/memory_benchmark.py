@@ -0,0 +1,103 @@
+# Measures the memory held per search node and the number of nodes that fit in a GB, with the
+# copy-on-write copies of the domain and task and with the deep copies the nodes used to make.
+# Run from the repository root: python -m search_partial_grounding.memory_benchmark [benchmark_path] [domain_class]
+import contextlib
+import copy
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+from pathlib import Path
+from model.domain import Domain, Task
+from custom_logger import StructuredLogger
+from exptools import list_instances
+from search_partial_grounding.node import Node
+
+
+@contextlib.contextmanager
+def deep_copies():
+    """Temporarily makes Domain.copy and Task.copy deep copies, as the nodes made them before."""
+    domain_copy, task_copy = Domain.copy, Task.copy
+    Domain.copy = lambda self: copy.deepcopy(self)
+    Task.copy = lambda self: copy.deepcopy(self)
+    try:
+        yield
+    finally:
+        Domain.copy, Task.copy = domain_copy, task_copy
+
+
+def generate_nodes(instance, logger, max_nodes):
+    """Generates up to max_nodes nodes breadth first and keeps all of them."""
+    Node.set_domain(instance.planning_domain)
+    Node.set_task(instance.planning_task)
+    Node.set_logger(logger)
+    Node.set_successor_generator('missing')
+    Node.set_heuristic_relaxation('unary')
+    Node.set_use_ff(False)
+    Node.set_grounder('in_memory')
+    initial_node = Node(
+        lifted_action_sequence=instance.lifted_plan,
+        ground_action_sequence=[],
+        parent=None,
+        is_initial_node=True,
+        h_cost_needed=False,
+        heuristic_relaxation='unary'
+    )
+    nodes = [initial_node]
+    queue = deque(nodes)
+    while queue and len(nodes) < max_nodes:
+        node = queue.popleft()
+        if node.is_goal():
+            continue
+        for neighbor in node.get_neighbors():
+            nodes.append(neighbor)
+            queue.append(neighbor)
+    return nodes
+
+
+def bytes_per_node(instance, logger, max_nodes):
+    gc.collect()
+    tracemalloc.start()
+    start_time = time.time()
+    before = tracemalloc.get_traced_memory()[0]
+    nodes = generate_nodes(instance, logger, max_nodes)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    elapsed = time.time() - start_time
+    tracemalloc.stop()
+    return used / len(nodes), len(nodes), elapsed
+
+
+def experiment(benchmark_path, domain_class=None, lift_prob=0.6, max_instances=10, max_nodes=200):
+    modes = ['deepcopy', 'copy-on-write']
+    totals = {mode: [0.0, 0] for mode in modes}
+    log_file = os.path.join(tempfile.mkdtemp(), 'memory_benchmark.yaml')
+    logger = StructuredLogger(log_file)
+
+    print("instance".ljust(70) + "".join(mode.rjust(28) for mode in modes))
+    for instance in list_instances(benchmark_path, domain_class=domain_class, lift_prob=lift_prob)[:max_instances]:
+        instance.load_to_memory()
+        row = instance.identifier.ljust(70)
+        for mode in modes:
+            context = deep_copies() if mode == 'deepcopy' else contextlib.nullcontext()
+            with context:
+                per_node, num_nodes, elapsed = bytes_per_node(instance, logger, max_nodes)
+            totals[mode][0] += per_node * num_nodes
+            totals[mode][1] += num_nodes
+            row += "{:>9.0f} B/node {:>4} {:6.2f}s".format(per_node, num_nodes, elapsed)
+        print(row, flush=True)
+
+    print()
+    print("mean".ljust(70) + "".join("{:>9.0f} B/node{:13}".format(total / max(num_nodes, 1), "")
+                                     for total, num_nodes in totals.values()))
+    print("nodes per GB".ljust(70) + "".join("{:>9.0f} nodes{:14}".format(2 ** 30 * num_nodes / max(total, 1), "")
+                                             for total, num_nodes in totals.values()))
+
+
+if __name__ == "__main__":
+    benchmark_path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path('./input/benchmarks-G1')
+    domain_class = sys.argv[2] if len(sys.argv) > 2 else None
+    experiment(benchmark_path, domain_class)
@@ -0,0 +1,285 @@
+"""
+In-memory counterparts of ground_pddl and exhaustive_groundings.
+
+They work directly on the model.domain.Domain / model.domain.Task objects instead of writing
+both to PDDL files and re-parsing them with lifted_pddl on every node expansion. The groundings
+are the same as the ones of the file based grounders, so the grounders are interchangeable.
+This includes the way lifted_pddl reads the actions:
+    - a precondition consisting of a single negative literal is read as a positive literal,
+    - nullary preconditions have to hold in the state, whether they are negated or not,
+    - (= ?x ?y) never holds and (not (= ?x ?y)) is ignored,
+    - a variable occurring twice in the positive precondition that binds it takes the value of
+      its last occurrence,
+    - a variable that is not bound by a positive precondition only ranges over the objects
+      whose type is exactly the type of the variable.
+Unlike lifted_pddl, constants may appear in the preconditions. The objects fixed by the lifted
+step are bound before the preconditions are joined, so only the consistent groundings are built.
+"""
+from itertools import product
+from fd.pddl.conditions import Conjunction, Literal
+from fd.pddl.predicates import Predicate
+from search_partial_grounding.lifted_pddl_grounder import extract_name_and_params, \
+    InvalidInputFormatError
+
+
+def type_hierarchy(domain):
+    """Maps every type to the set of its subtypes (including itself)."""
+    parents = {t.name: t.basetype_name for t in domain.types}
+    hierarchy = {'object': {'object'}}
+    for name in parents:
+        hierarchy.setdefault(name, set()).add(name)
+        ancestor = parents[name]
+        visited = {name}
+        # 'object - object' is declared by some of the benchmark domains
+        while ancestor is not None and ancestor not in visited:
+            hierarchy.setdefault(ancestor, {ancestor}).add(name)
+            visited.add(ancestor)
+            ancestor = parents.get(ancestor)
+    return hierarchy
+
+
+def typed_objects(domain, task):
+    """Returns a dictionary from the names of the constants and objects to their types."""
+    objects = {}
+    for obj in list(domain.constants) + list(task.objects):
+        objects[obj.name] = obj.type if obj.type is not None else 'object'
+    return objects
+
+
+def precondition_literals(action):
+    """Returns the preconditions of action as (positive, predicate, args) triples, as lifted_pddl reads them."""
+    precondition = action.precondition
+    if isinstance(precondition, Predicate):
+        return [(True, precondition.name, tuple(precondition.arguments))]
+    if isinstance(precondition, Conjunction):
+        literals = list(precondition.parts)
+    elif isinstance(precondition, Literal):
+        literals = [precondition]
+    else:
+        literals = []
+    if len(literals) == 1:
+        # a lone (not (p ...)) is unwrapped twice by lifted_pddl
+        return [(True, literals[0].predicate, tuple(literals[0].args))]
+    return [(not literal.negated, literal.predicate, tuple(literal.args)) for literal in literals]
+
+
+def state_index(task):
+    """Returns the atoms of the initial state of task as a set of (predicate, args) pairs and a predicate index."""
+    atoms = {('dummy-true', ())}
+    for atom in task.init:
+        if not atom.negated and atom.predicate != '=':
+            atoms.add((atom.predicate, tuple(atom.args)))
+    by_predicate = {}
+    for predicate, args in atoms:
+        by_predicate.setdefault(predicate, []).append(args)
+    return atoms, by_predicate
+
+
+# kinds of the terms of a joined literal
+_VAR, _ANY, _CONST = 0, 1, 2
+
+
+def _join_literals(positives, var_index):
+    """
+    Rewrites the positive preconditions into literals whose terms are (kind, value) pairs, so that they can be
+    joined in any order. lifted_pddl binds a variable that occurs twice in the literal binding it to the
+    last occurrence; the other occurrences are turned into wildcards that are only type checked.
+    """
+    literals = []
+    bound = set()
+    for predicate, args in positives:
+        terms = []
+        for pos, arg in enumerate(args):
+            v = var_index.get(arg)
+            if v is None:
+                terms.append((_CONST, arg))
+            elif v not in bound and arg in args[pos + 1:]:
+                terms.append((_ANY, v))
+            else:
+                terms.append((_VAR, v))
+        bound.update(var_index[arg] for arg in args if arg in var_index)
+        literals.append((predicate, terms))
+    return literals
+
+
+class _PositionIndex:
+    """Atoms of a state indexed by predicate and by (predicate, argument position, object)."""
+    def __init__(self, by_predicate):
+        self._by_predicate = by_predicate
+        self._index = {}
+
+    def atoms(self, predicate):
+        return self._by_predicate.get(predicate, ())
+
+    def lookup(self, predicate, pos):
+        index = self._index.get((predicate, pos))
+        if index is None:
+            index = {}
+            for args in self._by_predicate.get(predicate, ()):
+                index.setdefault(args[pos], []).append(args)
+            self._index[(predicate, pos)] = index
+        return index
+
+    def estimate(self, literal, bound):
+        """Expected number of matching atoms of literal per assignment of the bound variables."""
+        predicate, terms = literal
+        estimate = len(self.atoms(predicate))
+        for pos, (kind, value) in enumerate(terms):
+            if kind == _CONST:
+                estimate = min(estimate, len(self.lookup(predicate, pos).get(value, ())))
+            elif kind == _VAR and value in bound:
+                index = self.lookup(predicate, pos)
+                estimate = min(estimate, len(self.atoms(predicate)) / max(len(index), 1))
+        return estimate
+
+
+def applicable_groundings(domain, task, action, binding=None):
+    """
+    Returns the parameter tuples (object names) for which action is applicable in the initial state of task.
+    binding maps parameter positions to objects; only groundings consistent with it are generated.
+    The positive preconditions are joined starting with the most selective one, looking up the
+    matching atoms through the bound variables.
+    """
+    binding = binding or {}
+    hierarchy = type_hierarchy(domain)
+    objects = typed_objects(domain, task)
+    atoms, by_predicate = state_index(task)
+    index = _PositionIndex(by_predicate)
+
+    parameters = [p.name for p in action.parameters]
+    parameter_types = [p.type for p in action.parameters]
+    var_index = {name: i for i, name in enumerate(parameters)}
+
+    positives, negatives = [], []
+    for positive, predicate, args in precondition_literals(action):
+        if not args:
+            if (predicate, ()) not in atoms:
+                return set()
+        elif predicate == '=':
+            if positive:
+                return set()
+        elif positive:
+            positives.append((predicate, args))
+        else:
+            negatives.append((predicate, [(_CONST, a) if var_index.get(a) is None else (_VAR, var_index[a])
+                                          for a in args]))
+
+    assignment = [None] * len(parameters)
+    for v, obj in binding.items():
+        assignment[v] = obj
+    assignments = [tuple(assignment)]
+    bound = set(binding)
+    joined = set()
+
+    def holds(negative, g):
+        predicate, terms = negative
+        return (predicate, tuple(g[value] if kind == _VAR else value for kind, value in terms)) not in atoms
+
+    def check_negatives(assignments):
+        pending = []
+        for negative in negatives:
+            if all(kind == _CONST or value in bound for kind, value in negative[1]):
+                assignments = [g for g in assignments if holds(negative, g)]
+            else:
+                pending.append(negative)
+        negatives[:] = pending
+        return assignments
+
+    assignments = check_negatives(assignments)
+
+    remaining = _join_literals(positives, var_index)
+    while remaining and assignments:
+        literal = min(remaining, key=lambda lit: index.estimate(lit, bound))
+        remaining.remove(literal)
+        predicate, terms = literal
+        allowed = [hierarchy.get(parameter_types[value], ()) if kind != _CONST else None for kind, value in terms]
+        lookup_pos = next((pos for pos, (kind, value) in enumerate(terms)
+                           if kind == _CONST or (kind == _VAR and value in bound)), None)
+        lookup = index.lookup(predicate, lookup_pos) if lookup_pos is not None else None
+
+        new_assignments = set()
+        for g in assignments:
+            if lookup is None:
+                candidates = index.atoms(predicate)
+            else:
+                kind, value = terms[lookup_pos]
+                candidates = lookup.get(value if kind == _CONST else g[value], ())
+            for atom_args in candidates:
+                new_g = list(g)
+                for obj, (kind, value), types in zip(atom_args, terms, allowed):
+                    if kind == _CONST:
+                        if obj != value:
+                            break
+                    elif objects.get(obj) not in types:
+                        break
+                    elif kind == _VAR:
+                        if new_g[value] is None:
+                            new_g[value] = obj
+                        elif new_g[value] != obj:
+                            break
+                else:
+                    new_assignments.add(tuple(new_g))
+        assignments = new_assignments
+        joined.update(value for kind, value in terms if kind == _VAR)
+        bound.update(joined)
+        assignments = check_negatives(assignments)
+
+    if not assignments:
+        return set()
+
+    # the variables not bound by a positive precondition range over the objects of their exact type
+    if any(objects.get(obj) != parameter_types[v] for v, obj in binding.items() if v not in joined):
+        return set()
+    free = [v for v in range(len(parameters)) if v not in bound]
+    domains = [[obj for obj, obj_type in objects.items() if obj_type == parameter_types[v]] for v in free]
+    groundings = set()
+    for g in assignments:
+        for values in product(*domains):
+            new_g = list(g)
+            for v, obj in zip(free, values):
+                new_g[v] = obj
+            groundings.add(tuple(new_g))
+
+    for negative in negatives:
+        groundings = set(g for g in groundings if holds(negative, g))
+
+    return groundings
+
+
+def step_binding(lifted_action, action):
+    """Returns a dictionary from the parameter positions of action to the objects fixed by lifted_action."""
+    _, params = extract_name_and_params(lifted_action)
+    if len(params) != len(action.parameters):
+        raise InvalidInputFormatError(
+            f"Parameter length mismatch: input action has {len(params)} "
+            f"parameters but action {action.name} has {len(action.parameters)} parameters. "
+            f"Input action: {lifted_action}")
+    return {i: p for i, p in enumerate(params) if not p.startswith("?")}
+
+
+def ground_in_memory(domain, task, lifted_action):
+    """In-memory version of ground_pddl: the groundings of lifted_action that are applicable in the initial state of task."""
+    input_action_name, _ = extract_name_and_params(lifted_action)
+    action = domain.get_action(input_action_name)
+    binding = step_binding(lifted_action, action)
+    return ['({} '.format(input_action_name) + ' '.join(g) + ')'
+            for g in applicable_groundings(domain, task, action, binding)]
+
+
+def exhaustive_groundings_in_memory(domain, task, action_str):
+    """In-memory version of exhaustive_groundings: all type consistent groundings of action_str."""
+    input_action_name, _ = extract_name_and_params(action_str)
+    hierarchy = type_hierarchy(domain)
+    objects = typed_objects(domain, task)
+
+    action = domain.get_action(input_action_name)
+    binding = step_binding(action_str, action)
+    action_object_list = []
+    for i, param in enumerate(action.parameters):
+        allowed = hierarchy.get(param.type, ())
+        if i in binding:
+            action_object_list.append([binding[i]] if objects.get(binding[i]) in allowed else [])
+        else:
+            action_object_list.append([obj for obj, obj_type in objects.items() if obj_type in allowed])
+
+    return set(f'({input_action_name} {" ".join(p)})' for p in product(*action_object_list))
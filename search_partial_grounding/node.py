@@ -1,4 +1,4 @@
-from repairer import Repairer
+from repairer import Repairer, RepairContext
 from model.plan import PositivePlan, apply_action_sequence
 from typing import List
 import logging
@@ -8,22 +8,53 @@ from fd.pddl.conditions import Conjunction, Atom
 from fd.pddl.predicates import Predicate
 from heuristic_tools.heuristic import Heurisitc
 from search_partial_grounding.lifted_pddl_grounder import ground_pddl, exhaustive_groundings
+from search_partial_grounding.memory_grounder import ground_in_memory, exhaustive_groundings_in_memory
 import traceback
 import sys
+from collections import OrderedDict
 
 
 
 class Node:
+    # Nodes share as much as possible with their parents: the ground actions are a persistent chain of
+    # (previous chain, ground action) pairs, the remaining lifted actions are an offset into the lifted
+    # plan, and the repairs are an interned frozenset of repair ids. The repaired domain is rebuilt from
+    # the repairs on demand, the most recently used ones are cached.
+    __slots__ = ('is_initial_node', 'depth', 'parent', '_actions', '_hash', '_lifted_plan', '_lifted_offset',
+                 'h_cost_needed', 'h_relaxation', 'grounding_time', 'num_neighbours', '_exact_state',
+                 '_relaxed_state', 'repair_context', '_repair_ids', 'h_cost_pending', 'g_cost', 'h_cost',
+                 'h_cost_time', 'f_cost')
+
     original_domain = None
     original_task = None
     logger = None
     successor_generator = None
     use_ff = None
     heuristic_relaxation = None
+    incremental_repair = False
+    hitter_backend = 'fm'
+    grounder = 'lifted_pddl'
+    heuristic = None
+    heuristic_cache = None
+    repair_cache = None
+    symmetry = None
+    dominance_pruner = None
+    expander = None
+    lazy_heuristic = False
+    batch_heuristic = False
+    domain_cache_size = 256
+    _repair_index = {}
+    _repairs_by_id = []
+    _repair_sets = {}
+    _domains = OrderedDict()
     
     @classmethod
     def set_domain(cls, value):
         cls.original_domain = value
+        cls._repair_index = {}
+        cls._repairs_by_id = []
+        cls._repair_sets = {}
+        cls._domains = OrderedDict()
 
     @classmethod
     def set_task(cls, value):
@@ -42,21 +73,114 @@ class Node:
     def set_use_ff(cls, use_ff):
         cls.use_ff = use_ff
 
+    @classmethod
+    def set_incremental_repair(cls, incremental_repair):
+        cls.incremental_repair = incremental_repair
+
+    @classmethod
+    def set_hitter_backend(cls, hitter_backend):
+        assert hitter_backend in ['fm', 'rc2', 'rc2-incremental'], "Value error."
+        cls.hitter_backend = hitter_backend
+
+    @classmethod
+    def set_grounder(cls, grounder):
+        assert grounder in ['lifted_pddl', 'in_memory'], "Value error."
+        cls.grounder = grounder
+
+    @classmethod
+    def set_heuristic(cls, heuristic):
+        cls.heuristic = heuristic
+
+    @classmethod
+    def set_heuristic_cache(cls, heuristic_cache):
+        cls.heuristic_cache = heuristic_cache
+
+    @classmethod
+    def set_repair_cache(cls, repair_cache):
+        cls.repair_cache = repair_cache
+
+    @classmethod
+    def set_symmetry(cls, symmetry):
+        cls.symmetry = symmetry
+
+    @classmethod
+    def set_dominance_pruner(cls, dominance_pruner):
+        cls.dominance_pruner = dominance_pruner
+
+    @classmethod
+    def set_expander(cls, expander):
+        cls.expander = expander
+
+    @classmethod
+    def set_lazy_heuristic(cls, lazy_heuristic):
+        cls.lazy_heuristic = lazy_heuristic
+
+    @classmethod
+    def set_batch_heuristic(cls, batch_heuristic):
+        cls.batch_heuristic = batch_heuristic
+
     @classmethod
     def set_heuristic_relaxation(cls, heuristic_relaxation):
         assert heuristic_relaxation in ['unary', 'zeroary'], "Value error."
         cls.heuristic_relaxation = heuristic_relaxation
 
 
+    @classmethod
+    def _intern_repairs(cls, repairs):
+        """Returns the interned frozenset of the ids of repairs."""
+        ids = []
+        for repair in repairs:
+            repair_id = cls._repair_index.get(repair)
+            if repair_id is None:
+                repair_id = len(cls._repairs_by_id)
+                cls._repair_index[repair] = repair_id
+                cls._repairs_by_id.append(repair)
+            ids.append(repair_id)
+        ids = frozenset(ids)
+        return cls._repair_sets.setdefault(ids, ids)
+
+    @classmethod
+    def _domain_for(cls, repair_ids, domain=None):
+        """The original domain with the repairs of repair_ids applied. domain is such a domain, if already built."""
+        cached = cls._domains.get(repair_ids)
+        if cached is not None:
+            cls._domains.move_to_end(repair_ids)
+            return cached
+        if domain is None:
+            domain = cls.original_domain.copy()
+            domain.repairs = set(cls._repairs_by_id[i] for i in repair_ids)
+            domain.update()
+            domain.repaired = True
+        cls._domains[repair_ids] = domain
+        if len(cls._domains) > cls.domain_cache_size:
+            cls._domains.popitem(last=False)
+        return domain
+
+    @staticmethod
+    def _chain(ground_action_sequence):
+        actions, chain_hash = None, hash(())
+        for grounding in ground_action_sequence:
+            actions, chain_hash = (actions, grounding), hash((chain_hash, grounding))
+        return actions, chain_hash
+
+
     def __init__(self,
-                 lifted_action_sequence: List[str],
-                 ground_action_sequence: List[str],
+                 lifted_action_sequence: List[str] = None,
+                 ground_action_sequence: List[str] = None,
                  parent: 'Node' = None,
                  is_initial_node: bool = False,
                  depth=0,
                  h_cost_needed=False,
                  heuristic_relaxation=None,
+                 evaluation=None,
+                 grounding=None,
+                 batch_h_cost=False,
                  ):
+        """
+        The initial node takes the lifted plan and an empty ground action sequence. A child takes its
+        parent and the grounding of the parent's next lifted action instead. With batch_h_cost, the
+        heuristic value is left to compute_h_costs().
+        """
         if None in (self.original_domain, self.original_task, self.logger, self.successor_generator, self.heuristic_relaxation):
             raise ValueError("Class variables must be set before creating instances.")
         if self.original_task is None:
@@ -65,13 +189,22 @@ class Node:
             raise ValueError("Logger must be set before creating instances.")
 
         self.is_initial_node = is_initial_node
-        self.ground_action_sequence = ground_action_sequence
-        self.lifted_action_sequence = lifted_action_sequence
+        if grounding is not None:
+            self._actions = (parent._actions, grounding)
+            self._hash = hash((parent._hash, grounding))
+            self._lifted_plan, self._lifted_offset = parent._lifted_plan, parent._lifted_offset + 1
+        else:
+            self._actions, self._hash = self._chain(ground_action_sequence)
+            self._lifted_plan, self._lifted_offset = lifted_action_sequence, 0
         self.h_cost_needed = h_cost_needed
         self.parent = parent
         self.grounding_time = None
         self.h_relaxation = heuristic_relaxation
         self.num_neighbours = 0
+        self._exact_state = None
+        self._relaxed_state = None
+        self.repair_context = None
+        self.h_cost_pending = False
 
         if is_initial_node:
             assert len(ground_action_sequence) == 0
@@ -81,12 +214,24 @@ class Node:
             self.h_cost = 0
             self.h_cost_time = 0.0
             self.f_cost = 0
-            self.repaired_domain = copy.deepcopy(self.original_domain)
-            self.ground_repair_solution = None
+            self._repair_ids = self._intern_repairs(())
+            if self.incremental_repair:
+                self.repair_context = RepairContext()
+        elif evaluation is not None:
+            # repair and heuristic computed elsewhere, see evaluation()
+            self.depth = depth
+            self._restore_evaluation(evaluation)
+            self.h_cost_pending = self.h_cost_needed and self.lazy_heuristic
+            self.f_cost = self.g_cost + self.h_cost
         else:
             self.depth = depth
-            self.g_cost, self.ground_repair_solution, self.repaired_domain = self._ground_repair()
-            if self.h_cost_needed:
+            self.g_cost, self._repair_ids = self._ground_repair()
+            if self.h_cost_needed and self.lazy_heuristic:
+                # estimated by the parent's value until the searcher asks for it, see evaluate_h_cost()
+                self.h_cost = self.parent.h_cost
+                self.h_cost_time = 0
+                self.h_cost_pending = True
+            elif self.h_cost_needed and not batch_h_cost:
                 start_time = time.time()
                 self.h_cost = self.compute_h_cost()
                 end_time = time.time()
@@ -102,60 +247,315 @@ class Node:
         # plan.compute_subs(domain, task)
         # succeed = plan.execute(domain, task)
 
-        domain = copy.deepcopy(self.original_domain)
+        goal_empty = len(self.lifted_action_sequence) != 0
+        cache = self.repair_cache
+        if cache is not None:
+            cached = cache.get(self.ground_action_sequence, goal_empty)
+            if cached is not None:
+                # the repaired domain is rebuilt from the repairs when needed; the children repair from scratch
+                cost, repairs = cached
+                return cost, None if repairs is None else self._intern_repairs(repairs)
+
+        domain = self.original_domain.copy()
         task = self.original_task.copy()
 
-        if len(self.lifted_action_sequence) != 0:
+        if goal_empty:
             task.set_goal_empty()
-        plan = [PositivePlan(self.ground_action_sequence + [''])]
 
-        repairer = Repairer()
-        if repairer.repair(domain, [(task, plan)]):
-            return repairer.count_repair_lines(), repairer.get_repairs_string(), domain
+        repairer = Repairer(self.hitter_backend)
+        if self.incremental_repair and self.parent is not None and self.parent.repair_context is not None:
+            succeed = repairer.repair_extension(domain, task, self.ground_action_sequence,
+                                                self.parent.repair_context, self.parent.state_key())
+        else:
+            plan = [PositivePlan(self.ground_action_sequence + [''])]
+            succeed = repairer.repair(domain, [(task, plan)])
+        if succeed:
+            if self.incremental_repair:
+                self.repair_context = repairer.context
+            repair_ids = self._intern_repairs(domain.repairs)
+            self._domain_for(repair_ids, domain)
+            if cache is not None:
+                cache.put(self.ground_action_sequence, goal_empty, repairer.count_repair_lines(), domain.repairs)
+            return repairer.count_repair_lines(), repair_ids
         else:
-            return float('inf'), None, None
+            if cache is not None:
+                cache.put(self.ground_action_sequence, goal_empty, float('inf'), None)
+            return float('inf'), None
         
     
+    def evaluate_h_cost(self):
+        """Computes the deferred heuristic value of a lazily evaluated node. Returns False if it was not deferred."""
+        if not self.h_cost_pending:
+            return False
+        start_time = time.time()
+        self.h_cost = self.compute_h_cost()
+        self.h_cost_time = time.time() - start_time
+        self.f_cost = self.g_cost + self.h_cost
+        self.h_cost_pending = False
+        return True
+
+    def evaluation(self):
+        """
+        Picklable result of the repair and heuristic computation of this node, from which an equal node
+        is built with Node(..., evaluation=...). The repair context is None if it is the parent's one.
+        """
+        repair_context = self.repair_context
+        if self.parent is not None and repair_context is self.parent.repair_context:
+            repair_context = None
+        return (self.g_cost, self.repairs, repair_context, self.h_cost, self.h_cost_time, self._exact_state)
+
+    def _restore_evaluation(self, evaluation):
+        self.g_cost, repairs, repair_context, self.h_cost, self.h_cost_time, self._exact_state = evaluation
+        self._repair_ids = None if repairs is None else self._intern_repairs(repairs)
+        if repair_context is None and self.parent is not None:
+            repair_context = self.parent.repair_context
+        self.repair_context = repair_context
+
+    def detached(self, include_state=True):
+        """
+        Picklable copy of this node for expanding it in another process or spilling it to disk, see from_detached().
+        Without include_state, the state is copied only if it is already known; otherwise the rebuilt node computes
+        it from the initial state when it is needed.
+        """
+        state = self.state_key() if include_state else self._exact_state
+        return (self.depth, self.ground_action_sequence, self.lifted_action_sequence, self.h_cost_needed,
+                self.g_cost, self.h_cost, self.repairs, self.repair_context, state, self.h_cost_pending)
+
+    @classmethod
+    def from_detached(cls, detached, root):
+        """
+        Rebuilds a node copied with detached() as a child of root, the initial node. The children of the
+        rebuilt node have the same repairs, states and costs as the children of the original node;
+        their states are propagated from the rebuilt node or from the initial state.
+        """
+        (depth, ground_action_sequence, lifted_action_sequence, h_cost_needed,
+         g_cost, h_cost, repairs, repair_context, state, h_cost_pending) = detached
+        node = cls.__new__(cls)
+        node.is_initial_node = False
+        node._actions, node._hash = cls._chain(ground_action_sequence)
+        node._lifted_plan, node._lifted_offset = lifted_action_sequence, 0
+        node.h_cost_needed = h_cost_needed
+        node.parent = root
+        node.grounding_time = None
+        node.h_relaxation = root.h_relaxation
+        node.num_neighbours = 0
+        node._exact_state, node._relaxed_state = state, None
+        node.repair_context = repair_context
+        node.h_cost_pending = h_cost_pending
+        node.depth = depth
+        node.g_cost, node.h_cost, node.h_cost_time = g_cost, h_cost, 0.0
+        node.f_cost = g_cost + h_cost
+        node._repair_ids = cls._intern_repairs(repairs)
+        return node
+
+    @classmethod
+    def compact(cls, detached):
+        """
+        Smaller form of a detached node for checkpoints, without the remaining lifted actions, the repair context
+        and the state, and with the repairs as indices into repair_table(). See from_compact().
+        """
+        depth, ground_action_sequence, _, h_cost_needed, g_cost, h_cost, repairs, _, _, h_cost_pending = detached
+        return (depth, ground_action_sequence, h_cost_needed, g_cost, h_cost, tuple(cls._intern_repairs(repairs)),
+                h_cost_pending)
+
+    @classmethod
+    def repair_table(cls):
+        return list(cls._repairs_by_id)
+
+    @classmethod
+    def from_compact(cls, compact, root, repair_table):
+        """Rebuilds a node saved with compact() as a child of root. Its children repair from scratch."""
+        depth, ground_action_sequence, h_cost_needed, g_cost, h_cost, repair_ids, h_cost_pending = compact
+        repairs = [repair_table[i] for i in repair_ids]
+        return cls.from_detached((depth, ground_action_sequence, root.lifted_action_sequence[depth:], h_cost_needed,
+                                  g_cost, h_cost, repairs, None, None, h_cost_pending), root)
+
+    @property
+    def ground_action_sequence(self):
+        return self._last_actions(self.depth)
+
+    def _last_actions(self, n):
+        """The last n ground actions of the sequence."""
+        actions, chain = [], self._actions
+        for _ in range(n):
+            chain, grounding = chain
+            actions.append(grounding)
+        return actions[::-1]
+
+    @property
+    def lifted_action_sequence(self):
+        return self._lifted_plan[self._lifted_offset:]
+
+    @property
+    def repaired_domain(self):
+        if self._repair_ids is None:
+            return None
+        return self._domain_for(self._repair_ids)
+
+    @property
+    def repairs(self):
+        if self._repair_ids is None:
+            return None
+        return frozenset(self._repairs_by_id[i] for i in self._repair_ids)
+
+    @property
+    def ground_repair_solution(self):
+        if self.is_initial_node or self._repair_ids is None:
+            return None
+        return "\n".join(str(self._repairs_by_id[i]) for i in self._repair_ids)
+
     def calculate_current_state(self, delete_relaxation=False):
-        domain = copy.deepcopy(self.repaired_domain)
-        task = copy.deepcopy(self.original_task)
-        plan = PositivePlan(self.ground_action_sequence)
-        plan.compute_subs(self.repaired_domain, task)
+        return list(self._state(delete_relaxation))
+
+    def _state(self, delete_relaxation):
+        state = self._relaxed_state if delete_relaxation else self._exact_state
+        if state is None:
+            state = self._propagate_state(delete_relaxation)
+            if delete_relaxation:
+                self._relaxed_state = state
+            else:
+                self._exact_state = state
+        return state
+
+    def _propagate_state(self, delete_relaxation):
+        # Start from the deepest ancestor whose state is unaffected by the repairs of this node.
+        # For a child with the same repairs as its parent only the last ground action is applied.
+        if self.parent is None:
+            base_state, start = self.original_task.init, 0
+        else:
+            base_node = self._state_base()
+            base_state, start = base_node._state(delete_relaxation), base_node.depth
+
+        steps = self._last_actions(self.depth - start)
+        if not steps:
+            return frozenset(base_state)
+
+        domain = self.repaired_domain
+        task = self.original_task
+        plan = PositivePlan(steps)
+        plan.compute_subs(domain, task)
         try:
-            state = apply_action_sequence(domain, task, plan, delete_relaxed=delete_relaxation)
-            return state
+            state = apply_action_sequence(domain, task, plan, delete_relaxed=delete_relaxation, init_state=base_state)
+            return frozenset(state)
         except Exception as e:
             # Handle the exception
             print(f"domain: {domain.to_pddl()}")
             print(f"task: {task.to_pddl()}")
-            print(f"plan: {plan._steps}")
+            print(f"plan: {self.ground_action_sequence}")
             raise
 
+    def _state_base(self):
+        """
+        Returns the deepest ancestor whose state is also reached under the repairs of this node,
+        i.e. no action before the ancestor's depth is the target of a repair that differs between the two.
+        """
+        repair_ids = self._repair_ids
+        step_names = None
+        ancestor = self.parent
+        while ancestor.parent is not None:
+            changed = {self._repairs_by_id[i].target for i in repair_ids.symmetric_difference(ancestor._repair_ids)}
+            if not changed:
+                return ancestor
+            if step_names is None:
+                step_names = [step[1:-1].split()[0] for step in self.ground_action_sequence]
+            first_affected = next((i for i, name in enumerate(step_names[:ancestor.depth]) if name in changed),
+                                  ancestor.depth)
+            if first_affected == ancestor.depth:
+                return ancestor
+            while ancestor.depth > first_affected:
+                ancestor = ancestor.parent
+        return ancestor
+
+
+    @property
+    def repair_set(self):
+        """Canonical (order independent) form of the ground repair solution, the interned repair ids."""
+        if self._repair_ids is None:
+            return frozenset()
+        return self._repair_ids
+
+    def state_key(self):
+        """Hashable form of the state reached by the ground action sequence."""
+        return self._state(delete_relaxation=False)
+
+    def sequence_key(self):
+        """Hashable form of the ground action sequence, equal for equal nodes. It shares the links of the node."""
+        return self._actions
+
 
     def compute_h_cost(self):
         if len(self.lifted_action_sequence)==0:
             return 0
         
-        task = copy.deepcopy(self.original_task)
+        cache = self.heuristic_cache
+        if cache is not None:
+            h_cost = cache.get(self.state_key(), self.lifted_action_sequence)
+            if h_cost is not None:
+                return h_cost
+
+        task = self.original_task.copy()
         current_state = self.calculate_current_state(delete_relaxation=False)
         task.set_init_state(current_state)
         try:
-            h = Heurisitc(h_name='L_HADD', relaxation=self.heuristic_relaxation, use_ff=self.use_ff)
+            h = self.heuristic
+            if h is None:
+                h = Heurisitc(h_name='L_HADD', relaxation=self.heuristic_relaxation, use_ff=self.use_ff)
             h_cost = h.evaluate(self.original_domain, task, self.lifted_action_sequence)
+            if cache is not None:
+                cache.put(self.state_key(), self.lifted_action_sequence, h_cost)
             return h_cost
         except Exception as e:
-            # with open('lifted_actions.pkl', 'wb') as f:
-            #     pickle.dump(self.lifted_action_sequence, f)
-            print(f"Error in heuristic computation: {str(e)}")
-            print("Stack trace:")
-            print()
-            traceback.print_exc()
-            print(e)
-            log_data_error = {
-                'current_node': self.to_dict(include_state=True)
-            }
-            self.logger.log(issuer="node", event_type="error", level=logging.ERROR, message=log_data_error)
-            sys.exit(1)
+            self._heuristic_failed(e)
+
+    @classmethod
+    def compute_h_costs(cls, nodes):
+        """
+        Computes the heuristic values of nodes, e.g. the children of one expansion, with a single call of the
+        heuristic for the ones that aren't cached. The time of the call is split evenly among the nodes.
+        """
+        start_time = time.time()
+        cache = cls.heuristic_cache
+        pending = []
+        for node in nodes:
+            node.h_cost = 0 if len(node.lifted_action_sequence) == 0 else None
+            if node.h_cost is None and cache is not None:
+                node.h_cost = cache.get(node.state_key(), node.lifted_action_sequence)
+            if node.h_cost is None:
+                pending.append(node)
+
+        if pending:
+            try:
+                h = cls.heuristic
+                if h is None:
+                    h = Heurisitc(h_name='L_HADD', relaxation=cls.heuristic_relaxation, use_ff=cls.use_ff)
+                h_costs = h.evaluate_batch(cls.original_domain, cls.original_task,
+                                           [(node.calculate_current_state(delete_relaxation=False),
+                                             node.lifted_action_sequence) for node in pending])
+            except Exception as e:
+                pending[0]._heuristic_failed(e)
+            for node, h_cost in zip(pending, h_costs):
+                node.h_cost = h_cost
+                if cache is not None:
+                    cache.put(node.state_key(), node.lifted_action_sequence, h_cost)
+
+        h_cost_time = (time.time() - start_time) / len(nodes) if nodes else 0.0
+        for node in nodes:
+            node.h_cost_time = h_cost_time
+            node.f_cost = node.g_cost + node.h_cost
+
+    def _heuristic_failed(self, e):
+        # with open('lifted_actions.pkl', 'wb') as f:
+        #     pickle.dump(self.lifted_action_sequence, f)
+        print(f"Error in heuristic computation: {str(e)}")
+        print("Stack trace:")
+        print()
+        traceback.print_exc()
+        print(e)
+        log_data_error = {
+            'current_node': self.to_dict(include_state=True)
+        }
+        self.logger.log(issuer="node", event_type="error", level=logging.ERROR, message=log_data_error)
+        sys.exit(1)
 
     def get_neighbors(self):
         # don't try to expand this node if the cost is infinite (no repairs)
@@ -164,17 +564,19 @@ class Node:
         
         delete_relaxation = True if self.successor_generator in ('missing-and-negative', 'all') else False
         current_state = self.calculate_current_state(delete_relaxation=delete_relaxation)
-        task = copy.deepcopy(self.original_task)
+        task = self.original_task.copy()
         task.set_init_state(current_state)
-        domain = copy.deepcopy(self.repaired_domain)
+        domain = self.repaired_domain.copy()
 
-        # Precondition relaxation
+        # Precondition relaxation, on a copy of the action that only replaces it in this domain copy
         next_action_name = self.lifted_action_sequence[0][0]
-        action = domain.get_action(next_action_name)
+        action = copy.copy(domain.get_action(next_action_name))
+        domain.replace_action(action)
 
-        grounder = ground_pddl
+        in_memory = self.grounder == 'in_memory'
+        grounder = ground_in_memory if in_memory else ground_pddl
         if self.successor_generator == 'exhaust':
-            grounder = exhaustive_groundings
+            grounder = exhaustive_groundings_in_memory if in_memory else exhaustive_groundings
         elif self.successor_generator == 'all':
             action.precondition = Predicate('dummy-true', [])
         elif self.successor_generator in ('missing', 'missing-and-negative'):
@@ -203,34 +605,66 @@ class Node:
             self.logger.log(issuer="node", event_type="error", level=logging.ERROR, message=log_data_error)
             raise
 
+        if self.symmetry is not None:
+            possible_groundings = self.symmetry.reduce(possible_groundings, self.ground_action_sequence)
+
+        if self.expander is not None:
+            neighbours = self.expander.children(self, possible_groundings)
+        else:
+            neighbours = self.children(possible_groundings)
+        if self.dominance_pruner is not None:
+            neighbours = self.dominance_pruner.prune_siblings(neighbours)
+        
+        self.num_neighbours = len(neighbours)
+
+        return neighbours
+
+
+    def children(self, groundings, evaluations=None):
+        """
+        The children of this node for the given groundings of the next lifted action, without the ones
+        that can't be repaired. evaluations are the results of evaluation() for the children, if already known.
+        """
         neighbours = []
+        # with batch_heuristic, the heuristic values of the children are computed together, after the
+        # unrepairable ones are dropped
+        batch_h_cost = evaluations is None and self.h_cost_needed and self.batch_heuristic and not self.lazy_heuristic
 
-        for grounding in possible_groundings:
+        for i, grounding in enumerate(groundings):
             next_node = Node(
-                ground_action_sequence=self.ground_action_sequence + [grounding],
-                lifted_action_sequence=self.lifted_action_sequence[1:],
+                grounding=grounding,
                 parent=self,
                 is_initial_node=False,
                 depth=self.depth+1,
-                h_cost_needed=self.h_cost_needed
+                h_cost_needed=self.h_cost_needed,
+                evaluation=None if evaluations is None else evaluations[i],
+                batch_h_cost=batch_h_cost
             )
             if next_node.f_cost == float('inf'):
                 continue
             neighbours.append(next_node)
-        
-        self.num_neighbours = len(neighbours)
 
+        if batch_h_cost:
+            self.compute_h_costs(neighbours)
         return neighbours
 
 
     def is_goal(self):
-        return len(self.lifted_action_sequence) == 0 and self.f_cost != float('inf')
+        return self._lifted_offset == len(self._lifted_plan) and self.f_cost != float('inf')
 
 
     def __eq__(self, other):
         if not isinstance(other, Node):
             return False
-        return self.ground_action_sequence == other.ground_action_sequence
+        if self._hash != other._hash or self.depth != other.depth:
+            return False
+        # the chains are compared up to the first shared link
+        actions, other_actions = self._actions, other._actions
+        while actions is not other_actions:
+            if actions[1] != other_actions[1]:
+                return False
+            actions, other_actions = actions[0], other_actions[0]
+        return True
 
 
     def to_dict(self, include_state=False):
@@ -243,7 +677,8 @@ class Node:
             "h_cost": self.h_cost,
             "f_cost": self.f_cost,
             "next_lifted_action": next_lifted,
-            "num_neighbours": self.num_neighbours
+            "num_neighbours": self.num_neighbours,
+            "grounding_time": self.grounding_time
             # "first_10_possible_groundings": self.possible_groundings[:10] if self.possible_groundings is not None else self.possible_groundings
         }
         if include_state:
@@ -271,4 +706,4 @@ class Node:
 
 
     def __hash__(self):
-        return hash(tuple(self.ground_action_sequence))
+        return self._hash
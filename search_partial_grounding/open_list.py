@@ -0,0 +1,332 @@
+import heapq
+import os
+import pickle
+import sqlite3
+import sys
+import tempfile
+import weakref
+import psutil
+
+
+class OpenList:
+    """Priority queue of search nodes with a hash index for duplicate detection.
+
+    Entries are kept in a binary heap as ``(*priority, node)`` tuples, so the
+    expansion order is the same as pushing those tuples with ``heapq``
+    directly. Next to the heap, a dictionary keyed on the node (i.e. on
+    ``Node.__hash__``/``Node.__eq__``, the ground action sequence) points to
+    the live heap entry of every queued node. Membership tests therefore run
+    in constant time, and removing a node only drops it from the index: the
+    stale heap entry is skipped when it reaches the top (lazy deletion).
+
+    Once the stale entries make up half of the heap, the heap is rebuilt from
+    the live entries (see compact); nodes of equal priority may then be
+    popped in another order.
+
+    Optionally, the ground action sequences of expanded nodes
+    (``Node.sequence_key``) are kept in a closed set so that re-generated
+    nodes can be detected as well.
+    """
+
+    def __init__(self, use_closed_set=False):
+        self._heap = []
+        self._index = {}
+        self.use_closed_set = use_closed_set
+        self._closed = set()
+        self.num_lookups = 0
+        self.num_open_hits = 0
+        self.num_closed_hits = 0
+        self.num_lazy_deleted = 0
+
+    def __len__(self):
+        return len(self._index)
+
+    def __bool__(self):
+        return bool(self._index)
+
+    def __contains__(self, node):
+        self.num_lookups += 1
+        if node in self._index:
+            self.num_open_hits += 1
+            return True
+        return False
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def push(self, node, priority):
+        """Adds ``node`` with the given priority tuple, replacing an older entry of the same node."""
+        if node in self._index:
+            self.num_lazy_deleted += 1
+        entry = (*priority, node)
+        self._index[node] = entry
+        heapq.heappush(self._heap, entry)
+        self._compact_if_stale()
+
+    def pop(self):
+        """Removes and returns the node with the lowest priority."""
+        node, _ = self.pop_with_priority()
+        return node
+
+    def pop_with_priority(self):
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            node = entry[-1]
+            if self._index.get(node) is entry:
+                del self._index[node]
+                return node, entry[:-1]
+        raise IndexError("pop from an empty open list")
+
+    def peek_priority(self):
+        """Returns the priority of the next node to be popped, or None if the list is empty."""
+        while self._heap:
+            entry = self._heap[0]
+            if self._index.get(entry[-1]) is entry:
+                return entry[:-1]
+            heapq.heappop(self._heap)
+        return None
+
+    def remove(self, node):
+        """Lazily removes ``node``. Returns False if it was not queued."""
+        if self._index.pop(node, None) is None:
+            return False
+        self.num_lazy_deleted += 1
+        self._compact_if_stale()
+        return True
+
+    def entries(self):
+        """Yields the live ``(priority, node)`` pairs in no particular order."""
+        for node, entry in self._index.items():
+            yield entry[:-1], node
+
+    def detached_entries(self):
+        """
+        Yields the live ``(priority, Node.detached())`` pairs in heap order, e.g. to checkpoint the open list.
+        Pushing them in this order rebuilds the same heap, so ties are broken as before.
+        """
+        for entry in self._heap:
+            node = entry[-1]
+            if self._index.get(node) is entry:
+                yield entry[:-1], node.detached(include_state=False)
+
+    def close(self, node):
+        if self.use_closed_set:
+            self._closed.add(node.sequence_key())
+
+    def is_closed(self, node):
+        if not self.use_closed_set:
+            return False
+        self.num_lookups += 1
+        if node.sequence_key() in self._closed:
+            self.num_closed_hits += 1
+            return True
+        return False
+
+    def compact(self):
+        """Drops the stale heap entries left behind by lazy deletion."""
+        if len(self._heap) > len(self._index):
+            self._heap = list(self._index.values())
+            heapq.heapify(self._heap)
+
+    def _compact_if_stale(self):
+        if len(self._heap) > 2 * len(self._index) + 16:
+            self.compact()
+
+    def memory_bytes(self):
+        """Approximate size of the heap, index and closed set containers (nodes not included)."""
+        size = sys.getsizeof(self._heap) + sys.getsizeof(self._index) + sys.getsizeof(self._closed)
+        if self._heap:
+            size += len(self._heap) * sys.getsizeof(self._heap[0])
+        return size
+
+    def stats(self):
+        hits = self.num_open_hits + self.num_closed_hits
+        return {
+            "fringe_memory_bytes": self.memory_bytes(),
+            "fringe_heap_entries": len(self._heap),
+            "closed_set_size": len(self._closed),
+            "index_lookups": self.num_lookups,
+            "index_hits": hits,
+            "index_hit_rate": hits / self.num_lookups if self.num_lookups else 0.0,
+            "num_lazy_deleted": self.num_lazy_deleted,
+        }
+
+
+class SpillingOpenList(OpenList):
+    """Open list that moves its cold tail to disk when the process gets close to a memory watermark.
+
+    Every ``check_interval`` pushes the resident set size of the process is compared with
+    ``memory_watermark`` (in bytes). When it is above, the number of nodes kept in memory is capped
+    at half of the current one, and from then on, whenever the cap is exceeded, the entries with
+    the worst priorities are written to a SQLite table until half of the cap is left. The nodes
+    are stored with ``Node.detached()``, without computing the states that are not known yet, so
+    the spilled node objects, and the ancestors only they referenced, are freed. If the memory still grows past the watermark, the cap is halved again.
+
+    Before a pop, when the best spilled priority is not worse than the best one in memory, the best
+    spilled entries are loaded back with ``Node.from_detached()`` as children of ``root``. Nodes are
+    therefore popped in the same priority order, but ties may be broken differently, and the
+    parent of a reloaded node is the initial node. Spilled nodes are still found by membership
+    tests and can be removed; ``__iter__`` and ``entries()`` only cover the nodes in memory, while
+    ``detached_entries()`` covers the spilled ones as well.
+    Nodes also referenced by a transposition table stay in memory after they are spilled.
+    The spilled nodes are tracked by their ``Node.sequence_key()``, which is also stored on disk.
+    """
+
+    def __init__(self, root, memory_watermark, use_closed_set=False, check_interval=1000, load_batch=1000,
+                 spill_dir=None):
+        super().__init__(use_closed_set)
+        self.root = root
+        self.memory_watermark = memory_watermark
+        self.check_interval = check_interval
+        self.load_batch = load_batch
+        self.spill_dir = spill_dir
+        self.max_in_memory = None
+        self._process = psutil.Process()
+        self._rss_at_cap = 0
+        self._num_pushes = 0
+        self._db = None
+        self._width = None
+        self._spilled = set()
+        self._removed = set()
+        self._num_on_disk = 0
+        self._disk_min = None
+        self.num_spilled = 0
+        self.num_loaded = 0
+        self.num_spills = 0
+
+    def __len__(self):
+        return len(self._index) + len(self._spilled)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __contains__(self, node):
+        if super().__contains__(node):
+            return True
+        if self._spilled and node.sequence_key() in self._spilled:
+            self.num_open_hits += 1
+            return True
+        return False
+
+    def push(self, node, priority):
+        super().push(node, priority)
+        self._num_pushes += 1
+        if self._num_pushes % self.check_interval == 0:
+            rss = self._process.memory_info().rss
+            if rss > self.memory_watermark and rss > self._rss_at_cap:
+                self._rss_at_cap = rss
+                self.max_in_memory = max(len(self._index) // 2, 2 * self.load_batch)
+        if self.max_in_memory is not None and len(self._index) > self.max_in_memory:
+            self._spill(self.max_in_memory // 2)
+
+    def pop_with_priority(self):
+        # a loaded batch may only hold removed nodes, so the priorities are compared again after every load
+        while self._num_on_disk:
+            top = super().peek_priority()
+            if top is not None and not self._disk_min < top:
+                break
+            self._load()
+        return super().pop_with_priority()
+
+    def peek_priority(self):
+        top = super().peek_priority()
+        if self._num_on_disk and (top is None or self._disk_min < top):
+            return self._disk_min
+        return top
+
+    def remove(self, node):
+        if super().remove(node):
+            return True
+        key = node.sequence_key()
+        if key not in self._spilled:
+            return False
+        self._spilled.discard(key)
+        self._removed.add(key)
+        self.num_lazy_deleted += 1
+        return True
+
+    def detached_entries(self):
+        yield from super().detached_entries()
+        if self._num_on_disk:
+            for key, *priority, blob in self._db.execute(f"SELECT key, {self._order()}, node FROM spill"):
+                if pickle.loads(key) in self._spilled:
+                    yield tuple(priority), pickle.loads(blob)
+
+    def _connect(self):
+        fd, path = tempfile.mkstemp(prefix='open_list_', suffix='.sqlite', dir=self.spill_dir)
+        os.close(fd)
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode = OFF")
+        self._db.execute("PRAGMA synchronous = OFF")
+        columns = ", ".join(f"p{i} REAL" for i in range(self._width))
+        self._db.execute(f"CREATE TABLE spill (id INTEGER PRIMARY KEY, key BLOB, {columns}, node BLOB)")
+        self._db.execute(f"CREATE INDEX spill_priority ON spill ({self._order()})")
+        self._finalizer = weakref.finalize(self, self._drop, self._db, path)
+
+    @staticmethod
+    def _drop(db, path):
+        db.close()
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _order(self):
+        return ", ".join(f"p{i}" for i in range(self._width))
+
+    def _spill(self, size):
+        """Writes all but the size best entries in memory to disk."""
+        entries = sorted(self._index.values())
+        cold = entries[size:]
+        if not cold:
+            return
+        if self._db is None:
+            self._width = len(cold[0]) - 1
+            self._connect()
+        placeholders = ", ".join("?" * (self._width + 2))
+        with self._db:
+            self._db.executemany(
+                f"INSERT INTO spill (key, {self._order()}, node) VALUES ({placeholders})",
+                ((pickle.dumps(entry[-1].sequence_key(), pickle.HIGHEST_PROTOCOL), *entry[:-1],
+                  pickle.dumps(entry[-1].detached(include_state=False), pickle.HIGHEST_PROTOCOL))
+                 for entry in cold))
+        self._spilled.update(entry[-1].sequence_key() for entry in cold)
+        self._num_on_disk += len(cold)
+        self._disk_min = self._read_min()
+        self._heap = entries[:size]
+        self._index = {entry[-1]: entry for entry in self._heap}
+        self.num_spilled += len(cold)
+        self.num_spills += 1
+
+    def _load(self):
+        """Moves the best spilled entries back to memory."""
+        batch = self.load_batch if self.max_in_memory is None else min(self.load_batch, self.max_in_memory // 4)
+        rows = self._db.execute(
+            f"SELECT id, key, {self._order()}, node FROM spill ORDER BY {self._order()} LIMIT ?",
+            (max(batch, 1),)).fetchall()
+        with self._db:
+            self._db.executemany("DELETE FROM spill WHERE id = ?", ((row[0],) for row in rows))
+        self._num_on_disk -= len(rows)
+        for row in rows:
+            key = pickle.loads(row[1])
+            if key in self._removed:
+                self._removed.discard(key)
+                continue
+            self._spilled.discard(key)
+            node = type(self.root).from_detached(pickle.loads(row[-1]), self.root)
+            super().push(node, row[2:-1])
+            self.num_loaded += 1
+        self._disk_min = self._read_min()
+
+    def _read_min(self):
+        return self._db.execute(f"SELECT {self._order()} FROM spill ORDER BY {self._order()} LIMIT 1").fetchone()
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({
+            "fringe_in_memory": len(self._index),
+            "fringe_on_disk": len(self._spilled),
+            "max_in_memory": self.max_in_memory,
+            "num_spills": self.num_spills,
+            "num_spilled": self.num_spilled,
+            "num_loaded": self.num_loaded,
+        })
+        return stats
@@ -0,0 +1,68 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from search_partial_grounding.node import Node
+
+
+# initial node of a worker process, the common ancestor of all detached nodes expanded in it
+_root = None
+
+
+def _init_worker():
+    global _root
+    _root = Node(
+        lifted_action_sequence=[],
+        ground_action_sequence=[],
+        parent=None,
+        is_initial_node=True,
+    )
+
+
+def _evaluate_children(detached, groundings):
+    parent = Node.from_detached(detached, _root)
+    return [(child.ground_action_sequence[-1], child.evaluation()) for child in parent.children(groundings)]
+
+
+class ParallelExpander:
+    """Builds the children of a node in a pool of worker processes.
+
+    Every child runs its own repair and heuristic computation, independent of its siblings. The
+    workers are forked from the searching process once the class variables of Node are set, so
+    they start with the domain, the task and the heuristic of the instance. The fork also keeps
+    the cached hashes of the fd atoms valid in the workers. For every expansion the node is sent
+    to the workers with Node.detached() and the groundings are split into chunks; the workers
+    send back the evaluations of the children, which are turned into nodes in the order of the
+    groundings, so the search proceeds exactly as with the sequential expansion.
+    """
+
+    def __init__(self, num_workers, chunks_per_worker=4, min_groundings=2):
+        self.num_workers = num_workers
+        self.chunks_per_worker = chunks_per_worker
+        self.min_groundings = min_groundings
+        self._executor = None
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.num_workers,
+                                                 mp_context=multiprocessing.get_context('fork'),
+                                                 initializer=_init_worker)
+        return self._executor
+
+    def children(self, node, groundings):
+        groundings = list(groundings)
+        if len(groundings) < self.min_groundings:
+            return node.children(groundings)
+
+        num_chunks = min(len(groundings), self.num_workers * self.chunks_per_worker)
+        chunk_size = -(-len(groundings) // num_chunks)
+        chunks = [groundings[i:i + chunk_size] for i in range(0, len(groundings), chunk_size)]
+        detached = node.detached()
+        results = self._pool().map(_evaluate_children, [detached] * len(chunks), chunks)
+
+        evaluated = [child for chunk in results for child in chunk]
+        return node.children([grounding for grounding, _ in evaluated],
+                             [evaluation for _, evaluation in evaluated])
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
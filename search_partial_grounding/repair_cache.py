@@ -0,0 +1,119 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import sys
+from collections import OrderedDict
+from search_partial_grounding.checkpoint import dumps
+
+# bytes of an OrderedDict entry besides its key and value
+_ENTRY_OVERHEAD = 100
+
+
+class RepairCache:
+    """
+    Cache of repair results, keyed on a ground action sequence and on whether the goal of the task is emptied.
+
+    The repair of a node depends only on its ground action sequence and on whether it still has lifted actions
+    left, in which case the goal is ignored. A cached result is the repair cost and the repairs, from which
+    the node rebuilds its repaired domain instead of running the repair loop again. The least recently used
+    results are evicted when the estimated size of the cache exceeds max_mb. With a file, the results are also
+    stored in a SQLite table under the namespace (the instance), so that resumed searches and later runs of
+    the same instance reuse them. The file is only used by the process that created the cache.
+    """
+
+    def __init__(self, max_mb, path=None, namespace='', commit_interval=1000):
+        self.max_bytes = max_mb * 2 ** 20
+        self.path = path
+        self.namespace = namespace
+        self.commit_interval = commit_interval
+        self._values = OrderedDict()
+        self._num_bytes = 0
+        self._pid = os.getpid()
+        self._db = None
+        self._num_uncommitted = 0
+        self.num_hits = 0
+        self.num_disk_hits = 0
+        self.num_misses = 0
+
+    def _connection(self):
+        if self.path is None or os.getpid() != self._pid:
+            return None
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, timeout=60)
+            self._db.execute("CREATE TABLE IF NOT EXISTS repairs (key BLOB PRIMARY KEY, value BLOB)")
+        return self._db
+
+    def _key(self, ground_action_sequence, goal_empty):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.namespace.encode())
+        digest.update(b'\0' + '\n'.join(ground_action_sequence).encode())
+        digest.update(b'\1' if goal_empty else b'\0')
+        return digest.digest()
+
+    def get(self, ground_action_sequence, goal_empty):
+        """Returns the cached (cost, repairs) of ground_action_sequence, or None. repairs is None if it is unsolvable."""
+        key = self._key(ground_action_sequence, goal_empty)
+        value = self._values.get(key)
+        if value is not None:
+            self._values.move_to_end(key)
+            self.num_hits += 1
+            return value
+        db = self._connection()
+        if db is not None:
+            row = db.execute("SELECT value FROM repairs WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.num_disk_hits += 1
+                value = pickle.loads(row[0])
+                self._insert(key, value)
+                return value
+        self.num_misses += 1
+        return None
+
+    def put(self, ground_action_sequence, goal_empty, cost, repairs):
+        key = self._key(ground_action_sequence, goal_empty)
+        value = (cost, None if repairs is None else tuple(repairs))
+        self._insert(key, value)
+        db = self._connection()
+        if db is not None:
+            db.execute("INSERT OR REPLACE INTO repairs VALUES (?, ?)", (key, dumps(value)))
+            self._num_uncommitted += 1
+            if self._num_uncommitted >= self.commit_interval:
+                self.flush()
+
+    @staticmethod
+    def _size(key, value):
+        # the repairs themselves are shared with the nodes, only the tuple holding them is counted
+        return _ENTRY_OVERHEAD + sys.getsizeof(key) + sys.getsizeof(value) + sys.getsizeof(value[1] or ())
+
+    def _insert(self, key, value):
+        old = self._values.pop(key, None)
+        if old is not None:
+            self._num_bytes -= self._size(key, old)
+        self._values[key] = value
+        self._num_bytes += self._size(key, value)
+        while self._num_bytes > self.max_bytes and self._values:
+            old_key, old = self._values.popitem(last=False)
+            self._num_bytes -= self._size(old_key, old)
+
+    def flush(self):
+        if self._db is not None and os.getpid() == self._pid:
+            self._db.commit()
+            self._num_uncommitted = 0
+
+    def close(self):
+        self.flush()
+        if self._db is not None and os.getpid() == self._pid:
+            self._db.close()
+            self._db = None
+
+    def stats(self):
+        lookups = self.num_hits + self.num_disk_hits + self.num_misses
+        return {
+            "repair_cache_size": len(self._values),
+            "repair_cache_mb": self._num_bytes / 2 ** 20,
+            "repair_cache_hits": self.num_hits,
+            "repair_cache_disk_hits": self.num_disk_hits,
+            "repair_cache_misses": self.num_misses,
+            "repair_cache_hit_rate": (self.num_hits + self.num_disk_hits) / lookups if lookups else 0.0,
+        }
@@ -1,27 +1,87 @@
 import logging
-import heapq
+import time
+from search_partial_grounding.open_list import OpenList, SpillingOpenList
+from search_partial_grounding.transposition_table import TranspositionTable
+from heuristic_tools.heuristic import INFTY
 
 
 class Searcher:
-    def __init__(self, initial_node):
+    # saved in checkpoints and set again when a search is resumed
+    counters = ('num_nodes_generated', 'sum_h_cost', 'sum_f_cost', 'sum_h_cost_time', 'sum_grounding_time',
+                'max_grounding_time', 'num_expansions', 'h_max')
+
+    def __init__(self, initial_node, transposition_table=None):
         self.initial_node = initial_node
+        self.transposition_table = transposition_table
+        self.checkpointer = None
         self.num_nodes_generated = 1
         self.sum_h_cost = 0
         self.sum_f_cost = 0
         self.sum_h_cost_time = 0
         self.sum_grounding_time = 0
+        self.max_grounding_time = 0
+        self.num_expansions = 0
         self.h_max = float('-inf')
 
     def find_path(self, logger, log_interval):
         raise NotImplementedError("Subclasses must implement find_path method")
 
+    def set_checkpointer(self, checkpointer):
+        self.checkpointer = checkpointer
+
+    def initial_priority(self):
+        return None
+
+    def start(self, push):
+        """
+        Queues the initial node with push(node, priority), or the nodes of the checkpoint being resumed.
+        Returns the number of iterations done before.
+        """
+        if self.checkpointer is not None and self.checkpointer.resuming:
+            return self.checkpointer.restore(self, push)
+        push(self.initial_node, self.initial_priority())
+        self.merge_transposition(self.initial_node)
+        return 0
+
+    def save_checkpoint(self, iteration, entries):
+        """Writes a checkpoint if one is due. entries returns the queued (priority, detached node) pairs."""
+        if self.checkpointer is not None and self.checkpointer.due():
+            self.checkpointer.save(self, iteration, entries())
+
     def reconstruct_path(self, node):
         path = []
         while node:
             path.append(node)
             node = node.parent
         return path[::-1]
+
+    def merge_transposition(self, node, open_list=None):
+        """
+        Returns False if node is merged into a known node reaching the same repaired state, or is dominated by a
+        known node reaching the same state with fewer repairs (see DominancePruner).
+        """
+        pruner = self.initial_node.dominance_pruner
+        if pruner is not None and pruner.scope == 'open_list':
+            keep, dominated = pruner.insert(node)
+            if not keep:
+                return False
+            if open_list is not None:
+                for other in dominated:
+                    open_list.remove(other)
+        if self.transposition_table is None:
+            return True
+        return self.transposition_table.insert(node)
+
+    def record_expansion(self, node):
+        self.num_expansions += 1
+        self.sum_h_cost_time += node.h_cost_time
+        self.sum_grounding_time += node.grounding_time
+        self.max_grounding_time = max(self.max_grounding_time, node.grounding_time)
     
+    def stats(self):
+        """Searcher specific counters added to the logged iteration info."""
+        return {}
+
     def log_iteration_info(self, logger, iteration, open_list, current_node, final, is_goal):
         log_data = {
             "final": final,
@@ -33,20 +93,54 @@ class Searcher:
             "sum_f_cost": self.sum_f_cost,
             "sum_h_cost_time": self.sum_h_cost_time,
             "sum_grounding_time": self.sum_grounding_time,
+            "num_expansions": self.num_expansions,
+            "mean_grounding_time": self.sum_grounding_time / self.num_expansions if self.num_expansions else 0,
+            "max_grounding_time": self.max_grounding_time,
             "h_max": self.h_max,
             "current_node": current_node.to_dict(include_state=False)
         }
+        if isinstance(open_list, OpenList):
+            log_data.update(open_list.stats())
+        if self.transposition_table is not None:
+            log_data.update(self.transposition_table.stats())
+        if self.initial_node.heuristic_cache is not None:
+            log_data.update(self.initial_node.heuristic_cache.stats())
+        if self.initial_node.repair_cache is not None:
+            log_data.update(self.initial_node.repair_cache.stats())
+        if self.initial_node.symmetry is not None:
+            log_data.update(self.initial_node.symmetry.stats())
+        if self.initial_node.dominance_pruner is not None:
+            log_data.update(self.initial_node.dominance_pruner.stats())
+        log_data.update(self.stats())
         event_type = "final" if final else "general"
         logger.log(issuer="searcher", event_type=event_type, level=logging.INFO, message=log_data)
 
 
 class AStar(Searcher):
-    """AStar tree search with tie breakers of: 1. h_cost 2. depth"""
-    def __init__(self, initial_node, g_cost_multiplier=1, h_cost_multiplier=1, prune_func=None):
-        super().__init__(initial_node)
+    """
+    AStar tree search with tie breakers of: 1. h_cost 2. depth
+    With memory_watermark_mb, the open list spills its worst nodes to disk when the resident memory of the
+    process exceeds that many MB (see SpillingOpenList).
+    """
+    def __init__(self, initial_node, g_cost_multiplier=1, h_cost_multiplier=1, prune_func=None, use_closed_set=False,
+                 transposition_table=None, memory_watermark_mb=None):
+        super().__init__(initial_node, transposition_table)
         self.g_cost_multiplier = g_cost_multiplier
         self.h_cost_multiplier = h_cost_multiplier 
         self.prune_func = prune_func or (lambda _: False)
+        self.use_closed_set = use_closed_set
+        self.memory_watermark_mb = memory_watermark_mb
+
+    def make_open_list(self):
+        if self.memory_watermark_mb:
+            return SpillingOpenList(self.initial_node, self.memory_watermark_mb * 1024 * 1024,
+                                    use_closed_set=self.use_closed_set)
+        return OpenList(use_closed_set=self.use_closed_set)
+
+    def initial_priority(self):
+        f_cost = self.calculate_f_cost(self.initial_node)
+        h_cost = self.calculate_h_cost(self.initial_node)
+        return (f_cost, h_cost, -self.initial_node.depth)
     
     def calculate_f_cost(self, node):
         f = (self.g_cost_multiplier * node.g_cost) + self.calculate_h_cost(node)
@@ -60,16 +154,91 @@ class AStar(Searcher):
         return h
 
     def find_path(self, logger, log_interval):
-        open_list = []
+        open_list = self.make_open_list()
 
-        f_cost = self.calculate_f_cost(self.initial_node)
-        h_cost = self.calculate_h_cost(self.initial_node)
-        heapq.heappush(open_list, (f_cost, h_cost, -self.initial_node.depth, self.initial_node))
+        iteration = self.start(open_list.push)
+        while open_list:
+            iteration += 1
+            current_node = open_list.pop()
+            open_list.close(current_node)
+
+            if current_node.is_goal():
+                self.log_iteration_info(logger, iteration, open_list, current_node, final=True, is_goal=True)
+                return None, current_node
+
+            neighbours = current_node.get_neighbors()
+            self.num_nodes_generated += len(neighbours)
+            self.record_expansion(current_node)
+
+            for neighbor in neighbours:
+                if neighbor not in open_list:
+                    if open_list.is_closed(neighbor):
+                        continue
+                    if not self.prune_func(neighbor):
+                        if not self.merge_transposition(neighbor, open_list):
+                            continue
+                        f_cost = self.calculate_f_cost(neighbor)
+                        h_cost = self.calculate_h_cost(neighbor)
+                        open_list.push(neighbor, (f_cost, h_cost, -neighbor.depth))
+                else: 
+                    raise Exception("Identical node generation. Debug is needed.")
+
+            if iteration % log_interval == 0:
+                self.log_iteration_info(logger, iteration, open_list, current_node, final=False, is_goal=False)
+            self.save_checkpoint(iteration, open_list.detached_entries)
+
+        self.log_iteration_info(logger, iteration, open_list, current_node, final=True, is_goal=False)
+        return None, None
 
-        iteration = 0
+
+class LazyAStar(AStar):
+    """
+    AStar with deferred heuristic evaluation. The children are queued with the heuristic value of their
+    parent (see Node.set_lazy_heuristic) and compute their own one only when popped. A node whose
+    priority rises is re-inserted, unless it still comes first.
+    """
+    def __init__(self, initial_node, g_cost_multiplier=1, h_cost_multiplier=1, prune_func=None, use_closed_set=False,
+                 transposition_table=None, memory_watermark_mb=None):
+        super().__init__(initial_node, g_cost_multiplier, h_cost_multiplier, prune_func, use_closed_set,
+                         transposition_table, memory_watermark_mb)
+        self.num_deferred = 0
+        self.num_h_evaluations = 0
+        self.num_reinserted = 0
+
+    counters = AStar.counters + ('num_deferred', 'num_h_evaluations', 'num_reinserted')
+
+    def stats(self):
+        return {
+            "num_h_deferred": self.num_deferred,
+            "num_h_evaluations": self.num_h_evaluations,
+            "num_h_evaluations_saved": self.num_deferred - self.num_h_evaluations,
+            "num_reinserted": self.num_reinserted,
+        }
+
+    def find_path(self, logger, log_interval):
+        open_list = self.make_open_list()
+
+        iteration = self.start(open_list.push)
         while open_list:
             iteration += 1
-            current_node = heapq.heappop(open_list)[-1]
+            current_node, priority = open_list.pop_with_priority()
+
+            if current_node.evaluate_h_cost():
+                self.num_h_evaluations += 1
+                # dead ends are dropped
+                if current_node.h_cost >= INFTY:
+                    continue
+                # the node was counted in the stats when it was queued
+                h_cost = self.h_cost_multiplier * current_node.h_cost
+                f_cost = self.g_cost_multiplier * current_node.g_cost + h_cost
+                new_priority = (f_cost, h_cost, -current_node.depth)
+                next_priority = open_list.peek_priority()
+                if new_priority > priority and next_priority is not None and next_priority < new_priority:
+                    self.num_reinserted += 1
+                    open_list.push(current_node, new_priority)
+                    continue
+
+            open_list.close(current_node)
 
             if current_node.is_goal():
                 self.log_iteration_info(logger, iteration, open_list, current_node, final=True, is_goal=True)
@@ -77,58 +246,134 @@ class AStar(Searcher):
 
             neighbours = current_node.get_neighbors()
             self.num_nodes_generated += len(neighbours)
-            self.sum_h_cost_time += current_node.h_cost_time
-            self.sum_grounding_time += current_node.grounding_time
+            self.record_expansion(current_node)
 
             for neighbor in neighbours:
-                if not any(node[-1]==neighbor for node in open_list):
+                if neighbor not in open_list:
+                    if open_list.is_closed(neighbor):
+                        continue
                     if not self.prune_func(neighbor):
+                        if not self.merge_transposition(neighbor, open_list):
+                            continue
+                        if neighbor.h_cost_pending:
+                            self.num_deferred += 1
                         f_cost = self.calculate_f_cost(neighbor)
                         h_cost = self.calculate_h_cost(neighbor)
-                        heapq.heappush(open_list, (f_cost, h_cost, -neighbor.depth, neighbor))
+                        open_list.push(neighbor, (f_cost, h_cost, -neighbor.depth))
                 else: 
                     raise Exception("Identical node generation. Debug is needed.")
 
             if iteration % log_interval == 0:
                 self.log_iteration_info(logger, iteration, open_list, current_node, final=False, is_goal=False)
+            self.save_checkpoint(iteration, open_list.detached_entries)
 
         self.log_iteration_info(logger, iteration, open_list, current_node, final=True, is_goal=False)
         return None, None
 
 
-class BranchBound(Searcher):
-    def __init__(self, initial_node):
-        super().__init__(initial_node)
+class BranchBound(AStar):
+    """
+    Anytime branch and bound. Nodes are expanded in the order of their h_cost. Every goal found becomes the
+    incumbent, and from then on the nodes whose g_cost + h_cost is not below its cost are pruned, both when
+    they are generated and when they are popped. The open list and the transposition table are kept across
+    the improvements, so no node is expanded twice. Every improvement is logged as an "incumbent" event.
+    """
+    def __init__(self, initial_node, use_transposition_table=False, memory_watermark_mb=None):
+        super().__init__(initial_node, g_cost_multiplier=0, h_cost_multiplier=1,
+                         transposition_table=TranspositionTable() if use_transposition_table else None,
+                         memory_watermark_mb=memory_watermark_mb)
+        self.use_transposition_table = use_transposition_table
+        self.incumbent = None
+        self.num_improvements = 0
+        self.num_pruned = 0
+
+    counters = AStar.counters + ('num_improvements', 'num_pruned')
 
     def prune_strategy(self, node, current_best_cost):
         return node.h_cost + node.g_cost >= current_best_cost
-    
+
+    @property
+    def best_cost(self):
+        return float('inf') if self.incumbent is None else self.incumbent.g_cost
+
+    def stats(self):
+        return {
+            "best_cost": self.best_cost,
+            "num_improvements": self.num_improvements,
+            "num_pruned": self.num_pruned,
+        }
+
+    def log_improvement(self, logger, iteration, elapsed):
+        log_data = {
+            "elapsed_seconds": elapsed,
+            "iteration": iteration,
+            "num_nodes_generated": self.num_nodes_generated,
+            "num_expansions": self.num_expansions,
+            "g_cost": self.incumbent.g_cost,
+            "repair_set": self.incumbent.ground_repair_solution,
+        }
+        logger.log(issuer="searcher", event_type="incumbent", level=logging.INFO, message=log_data)
+
     def find_path(self, logger, log_interval):
-        current_best_cost = float('inf')
-        while True:
-            searcher = AStar(self.initial_node,
-                             g_cost_multiplier=0,
-                             h_cost_multiplier=1,
-                             prune_func=lambda node: self.prune_strategy(node, current_best_cost)
-            )
-            _, goal_node = searcher.find_path(logger=logger, log_interval=log_interval)
-            if not goal_node:
-                break
-            current_best_cost = goal_node.g_cost
+        start_time = time.time()
+        open_list = self.make_open_list()
+
+        iteration = self.start(open_list.push)
+        current_node = self.initial_node
+        while open_list:
+            iteration += 1
+            current_node = open_list.pop()
+            if self.prune_strategy(current_node, self.best_cost):
+                self.num_pruned += 1
+                continue
+
+            if current_node.is_goal():
+                self.incumbent = current_node
+                self.num_improvements += 1
+                self.log_improvement(logger, iteration, time.time() - start_time)
+                continue
+
+            neighbours = current_node.get_neighbors()
+            self.num_nodes_generated += len(neighbours)
+            self.record_expansion(current_node)
+
+            for neighbor in neighbours:
+                if neighbor in open_list:
+                    raise Exception("Identical node generation. Debug is needed.")
+                if self.prune_strategy(neighbor, self.best_cost):
+                    self.num_pruned += 1
+                    continue
+                if not self.merge_transposition(neighbor, open_list):
+                    continue
+                f_cost = self.calculate_f_cost(neighbor)
+                h_cost = self.calculate_h_cost(neighbor)
+                open_list.push(neighbor, (f_cost, h_cost, -neighbor.depth))
+
+            if iteration % log_interval == 0:
+                self.log_iteration_info(logger, iteration, open_list, current_node, final=False, is_goal=False)
+            self.save_checkpoint(iteration, open_list.detached_entries)
+
+        is_goal = self.incumbent is not None
+        self.log_iteration_info(logger, iteration, open_list, self.incumbent if is_goal else current_node,
+                                final=True, is_goal=is_goal)
+        return None, self.incumbent
 
 
 class DFS(Searcher):
     """DFS tree search"""
-    def __init__(self, initial_node):
-        super().__init__(initial_node)
+    def __init__(self, initial_node, transposition_table=None):
+        super().__init__(initial_node, transposition_table)
 
     def find_path(self, logger, log_interval):
-        stack = [self.initial_node]
-        iteration = 0
+        stack = []
+        iteration = self.start(lambda node, _: stack.append(node))
         
         while stack:
             iteration += 1
             current_node = stack.pop()
+            pruner = current_node.dominance_pruner
+            if pruner is not None and pruner.scope == 'open_list' and not pruner.is_kept(current_node):
+                continue
 
             if current_node.is_goal():
                 self.log_iteration_info(logger, iteration, ['not logged'], current_node, final=True, is_goal=True)
@@ -136,14 +381,15 @@ class DFS(Searcher):
 
             neighbors = sorted(current_node.get_neighbors(), key=lambda x: x.g_cost, reverse=True)
             self.num_nodes_generated += len(neighbors)
-            self.sum_h_cost_time += current_node.h_cost_time
-            self.sum_grounding_time += current_node.grounding_time
+            self.record_expansion(current_node)
             
             for neighbor in neighbors:
-                stack.append(neighbor)
+                if self.merge_transposition(neighbor):
+                    stack.append(neighbor)
 
             if iteration % log_interval == 0:
                 self.log_iteration_info(logger, iteration, ['not logged'], current_node, final=False, is_goal=False)
+            self.save_checkpoint(iteration, lambda: ((None, node.detached(include_state=False)) for node in stack))
 
         self.log_iteration_info(logger, iteration, ['not logged'], current_node, final=True, is_goal=False)
         return None, None
\ No newline at end of file
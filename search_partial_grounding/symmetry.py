@@ -0,0 +1,115 @@
+from fd.pddl.conditions import Literal
+from search_partial_grounding.memory_grounder import typed_objects
+
+
+def _goal_literals(condition):
+    if isinstance(condition, Literal):
+        return [condition]
+    return [literal for part in getattr(condition, 'parts', ()) for literal in _goal_literals(part)]
+
+
+def _action_args(action):
+    return action.strip('()').split()[1:]
+
+
+class ObjectSymmetry:
+    """
+    Groups the objects of a task that are interchangeable, to expand one grounding per orbit of symmetric groundings.
+
+    Two objects of the same type are interchangeable if swapping them maps the initial state and the goal onto
+    themselves and neither is a domain constant or a constant of the lifted plan. Such swaps generate the orbits.
+    Since the repairs are lifted, the swap also maps the repairs of a ground action sequence that doesn't contain
+    the two objects onto repairs of the same cost, so the current state, the repair costs and the heuristic values
+    of the children of a node are symmetric in the objects of an orbit that don't occur in its ground actions.
+    Of the groundings of the next lifted action that only differ by a permutation of such objects, the first one
+    is kept.
+    """
+
+    def __init__(self, domain, task, lifted_plan):
+        objects = typed_objects(domain, task)
+        fixed = {constant.name for constant in domain.constants}
+        fixed.update(arg for step in lifted_plan for arg in step[1:] if not arg.startswith('?'))
+        facts = {('init', atom.negated, atom.predicate, tuple(atom.args))
+                 for atom in task.init if atom.predicate != '='}
+        facts.update(('goal', literal.negated, literal.predicate, tuple(literal.args))
+                     for literal in _goal_literals(task.goal))
+        facts_of = {}
+        for fact in facts:
+            for arg in set(fact[3]):
+                facts_of.setdefault(arg, []).append(fact)
+
+        # objects with the same type and the same facts up to their own name are candidates, verified by a swap
+        candidates = {}
+        for obj, obj_type in objects.items():
+            if obj in fixed:
+                continue
+            signature = frozenset(fact[:3] + (tuple('*' if arg == obj else arg for arg in fact[3]),)
+                                  for fact in facts_of.get(obj, ()))
+            candidates.setdefault((obj_type, signature), []).append(obj)
+
+        self._orbit = {}
+        self.num_orbits = 0
+        for members in candidates.values():
+            orbits = []
+            for obj in sorted(members):
+                for orbit in orbits:
+                    if self._swappable(orbit[0], obj, facts, facts_of):
+                        orbit.append(obj)
+                        break
+                else:
+                    orbits.append([obj])
+            for orbit in orbits:
+                if len(orbit) > 1:
+                    for obj in orbit:
+                        self._orbit[obj] = self.num_orbits
+                    self.num_orbits += 1
+        self.num_symmetric_objects = len(self._orbit)
+        self.num_groundings = 0
+        self.num_representatives = 0
+        self.num_reductions = 0
+
+    @staticmethod
+    def _swappable(a, b, facts, facts_of):
+        swap = {a: b, b: a}
+        for fact in facts_of.get(a, []) + facts_of.get(b, []):
+            if fact[:3] + (tuple(swap.get(arg, arg) for arg in fact[3]),) not in facts:
+                return False
+        return True
+
+    def reduce(self, groundings, ground_action_sequence):
+        """The groundings that are not symmetric to an earlier one, given the ground actions before them."""
+        self.num_reductions += 1
+        self.num_groundings += len(groundings)
+        if not self._orbit:
+            self.num_representatives += len(groundings)
+            return groundings
+        used = {arg for action in ground_action_sequence for arg in _action_args(action)}
+        seen = set()
+        representatives = []
+        for grounding in groundings:
+            # objects of an orbit are numbered in the order they occur in, the other arguments are kept
+            numbering, per_orbit = {}, {}
+            key = []
+            for arg in _action_args(grounding):
+                orbit = self._orbit.get(arg)
+                if orbit is None or arg in used:
+                    key.append(arg)
+                    continue
+                if arg not in numbering:
+                    numbering[arg] = (orbit, per_orbit.get(orbit, 0))
+                    per_orbit[orbit] = numbering[arg][1] + 1
+                key.append(numbering[arg])
+            key = tuple(key)
+            if key not in seen:
+                seen.add(key)
+                representatives.append(grounding)
+        self.num_representatives += len(representatives)
+        return representatives
+
+    def stats(self):
+        return {
+            "symmetric_objects": self.num_symmetric_objects,
+            "symmetry_orbits": self.num_orbits,
+            "branching_before_symmetry": self.num_groundings / self.num_reductions if self.num_reductions else 0.0,
+            "branching_after_symmetry": self.num_representatives / self.num_reductions if self.num_reductions else 0.0,
+        }
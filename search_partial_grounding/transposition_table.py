@@ -0,0 +1,44 @@
+class TranspositionTable:
+    """Merges search nodes that reach the same repaired state.
+
+    Two nodes at the same depth share the remaining lifted action sequence.
+    If they also have the same repair set (and therefore the same g_cost) and
+    the same resulting state, they have the same children, so only the first
+    node seen per (depth, repair set, state) key is kept; the searchers drop
+    the others.
+
+    The merging is not exact: the repair of a child is computed for its whole
+    ground action sequence, so the same child of two merged nodes can have
+    different repair costs, and dropping a node can lose the optimal repair.
+    """
+
+    def __init__(self):
+        self._table = {}
+        self.num_lookups = 0
+        self.num_merged = 0
+
+    def __len__(self):
+        return len(self._table)
+
+    @staticmethod
+    def key(node):
+        return node.depth, node.repair_set, node.state_key()
+
+    def insert(self, node):
+        """Registers ``node``. Returns False if another node with the same key is already known."""
+        self.num_lookups += 1
+        representative = self._table.setdefault(self.key(node), node)
+        if representative is node:
+            return True
+        self.num_merged += 1
+        return False
+
+    def clear(self):
+        self._table.clear()
+
+    def stats(self):
+        return {
+            "tt_size": len(self._table),
+            "tt_lookups": self.num_lookups,
+            "tt_merged": self.num_merged,
+        }